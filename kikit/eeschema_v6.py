@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
-from kikit.sexpr import Atom, parseSexprF
+from kikit.sexpr import Atom, iterSexprChildrenF
+from kikit.parseCache import defaultParseCache
 from itertools import islice
+import io
 import os
 from typing import Optional
 from copy import deepcopy
@@ -183,23 +185,59 @@ def extractSymbolInstanceV6(sexpr, path):
             s.footprint = x[1].value
     return s
 
-def collectSymbols(filename, path = None, parentProperties = {}):
+@dataclass
+class SheetReference:
+    filename: str
+    path: str
+    properties: dict = field(default_factory=dict)
+
+def iterSheetItemsF(sheetFile):
     """
-    Crawl given sheet and return two lists - one with symbols, one with
-    symbol instances
+    Yield the top-level items of a sheet needed to collect its symbols - the
+    sheet uuid, symbols, subsheets and symbol instances. The sheet is processed
+    item by item, so we never keep the whole sheet in memory.
+    """
+    for item in iterSexprChildrenF(sheetFile):
+        if isUuid(item) or isSymbol(item) or isSheet(item) or isSymbolInstances(item):
+            yield item
+
+def iterSheetItems(filename):
+    """
+    Yield the top-level items of a sheet stored in a file, see iterSheetItemsF.
+    """
+    with open(filename, encoding="utf-8") as sheetFile:
+        yield from iterSheetItemsF(sheetFile)
+
+def readSheetItems(filename):
+    """
+    Return the items of a sheet as iterSheetItems does. The items don't depend
+    on where the sheet is used in the hierarchy, so when the parse cache is
+    enabled, they are cached per file and shared by all designs using the sheet.
+    """
+    cache = defaultParseCache()
+    if cache is None:
+        return iterSheetItems(filename)
+    def compute(content):
+        with io.TextIOWrapper(io.BytesIO(content), encoding="utf-8") as sheetFile:
+            return list(iterSheetItemsF(sheetFile))
+    return cache.fetch("kicad_sch", filename, compute)
+
+def readSheet(filename, path = None, parentProperties = {}):
+    """
+    Read a single sheet without descending into its subsheets. Return the path
+    of the sheet and a list of its symbols, symbol instances and references to
+    subsheets in the order they appear in the file.
     """
     isRoot = path is None
-    with open(filename, encoding="utf-8") as f:
-        sheetSExpr = parseSexprF(f)
-    symbols, instances = [], []
-    for item in sheetSExpr.items:
+    items = []
+    for item in readSheetItems(filename):
         if isUuid(item) and path is None:
             path = "/" + item.items[1].value
         if isSymbol(item):
-            symbols.append(extractSymbol(item, path, parentProperties = parentProperties))
+            items.append(extractSymbol(item, path, parentProperties = parentProperties))
             instance = extractSymbolInstance(item, path)
             if instance is not None:
-                instances.append(instance)
+                items.append(instance)
             continue
         if isSheet(item):
             f = getProperty(item, "Sheet file")
@@ -212,17 +250,32 @@ def collectSymbols(filename, path = None, parentProperties = {}):
             dirname = os.path.dirname(filename)
             if len(dirname) > 0:
                 f = dirname + "/" + f
-            sheetProperties = collectProperties(item)
-            s, i = collectSymbols(f, path + "/" + uuid, sheetProperties)
-            symbols += s
-            instances += i
+            items.append(SheetReference(f, path + "/" + uuid, collectProperties(item)))
             continue
         # v6 contains symbol instances in a top-level sheet in symbol instances
         if isSymbolInstances(item) and isRoot:
             for p in item.items:
                 if isPath(p):
-                    instances.append(extractSymbolInstanceV6(p, path))
+                    items.append(extractSymbolInstanceV6(p, path))
             continue
+    return path, items
+
+def collectSymbols(filename, path = None, parentProperties = {}):
+    """
+    Crawl given sheet and return two lists - one with symbols, one with
+    symbol instances
+    """
+    path, items = readSheet(filename, path, parentProperties)
+    symbols, instances = [], []
+    for item in items:
+        if isinstance(item, Symbol):
+            symbols.append(item)
+        elif isinstance(item, SymbolInstance):
+            instances.append(item)
+        else:
+            s, i = collectSymbols(item.filename, item.path, item.properties)
+            symbols += s
+            instances += i
     return symbols, instances
 
 
@@ -1,6 +1,8 @@
 from copy import deepcopy
 import itertools
 import textwrap
+import io
+from math import cos, radians, sin, sqrt
 import pcbnew
 from pcbnew import LoadBoard, ToMM, VECTOR2I, BOX2I, EDA_ANGLE
 from kikit import sexpr
@@ -28,11 +30,14 @@ from dataclasses import dataclass
 from kikit import substrate
 from kikit import units
 from kikit.kicadUtil import getPageDimensionsFromAst
-from kikit.substrate import Substrate, linestringToKicad, extractRings, TabError, TabFilletError
+from kikit.substrate import (Substrate, linestringToKicad, extractRings, TabError,
+    TabFilletError, buildEdgeShapes)
 from kikit.defs import PAPER_DIMENSIONS, STROKE_T, Layer, EDA_TEXT_HJUSTIFY_T, EDA_TEXT_VJUSTIFY_T, PAPER_SIZES
 from kikit.common import *
-from kikit.sexpr import isElement, parseSexprF, SExpr, Atom, findNode, parseSexprListF
+from kikit.sexpr import (isElement, parseSexprLazyF, SExpr, Atom, findNode,
+    parseSexprListFastF, dumpSexprF)
 from kikit.annotations import AnnotationReader, TabAnnotation
+from kikit.parseCache import cachedParse
 from kikit.drc import DrcExclusion, readBoardDrcExclusions, serializeExclusion
 from kikit.units import mm, deg, inch
 from kikit.pcbnew_utils import increaseZonePriorities
@@ -211,13 +216,21 @@ def appendItem(board: pcbnew.BOARD, item: pcbnew.BOARD_ITEM,
     yieldMapping callback. This callback is invoked with an old ID and the new
     ID. Mapping is applicable only in v6.
     """
+    board.Add(duplicateItem(item, yieldMapping))
+
+def duplicateItem(item: pcbnew.BOARD_ITEM,
+                  yieldMapping: Optional[Callable[[str, str], None]]=None) -> pcbnew.BOARD_ITEM:
+    """
+    Make a copy of the item that is not attached to any board. The mapping
+    between the old and new identifiers is yielded the same way as in
+    appendItem.
+    """
     try:
         newItem = item.Duplicate()
     except TypeError: # Footprint has overridden the method, cannot be called directly
         newItem = pcbnew.Cast_to_BOARD_ITEM(item).Duplicate().Cast()
-    board.Add(newItem)
     if not yieldMapping:
-        return
+        return newItem
     if isinstance(item, pcbnew.FOOTPRINT):
         newFootprint = pcbnew.Cast_to_FOOTPRINT(newItem)
         for getter in [lambda x: x.Pads(), lambda x: x.GraphicalItems(), lambda x: x.Zones()]:
@@ -228,14 +241,11 @@ def appendItem(board: pcbnew.BOARD, item: pcbnew.BOARD_ITEM,
                 assert o.GetPosition() == n.GetPosition()
                 yieldMapping(o.m_Uuid.AsString(), n.m_Uuid.AsString())
     yieldMapping(item.m_Uuid.AsString(), newItem.m_Uuid.AsString())
+    return newItem
 
 def collectNetNames(board):
     return [str(x) for x in board.GetNetInfo().NetsByName() if len(str(x)) > 0]
 
-def remapNets(collection, mapping):
-    for item in collection:
-        item.SetNetCode(mapping[item.GetNetname()].GetNetCode())
-
 ToPolygonGeometry = Union[Polygon, BOX2I, Substrate]
 def toPolygon(entity: Union[List[ToPolygonGeometry], ToPolygonGeometry]) -> Polygon:
     if isinstance(entity, list):
@@ -283,18 +293,86 @@ def roundPoint(point, precision=-4):
         return Point(round(point.x, precision), round(point.y, precision))
     return Point(round(point[0], precision), round(point[1], precision))
 
+def _kiRound(values: np.ndarray) -> np.ndarray:
+    """
+    Round to integers the same way as KiCAD's KiROUND - halves away from zero
+    """
+    return np.trunc(np.where(values < 0, values - 0.5, values + 0.5)).astype(np.int64)
+
+def _kiSinCos(degrees: float) -> Tuple[float, float]:
+    """
+    Sine and cosine of an angle as computed by KiCAD's EDA_ANGLE, which is exact
+    for multiples of 45°
+    """
+    normalized = degrees
+    while normalized < 0:
+        normalized += 360
+    while normalized >= 360:
+        normalized -= 360
+    exact = {
+        0: (0.0, 1.0),
+        45: (sqrt(0.5), sqrt(0.5)),
+        90: (1.0, 0.0),
+        135: (sqrt(0.5), -sqrt(0.5)),
+        180: (0.0, -1.0),
+        225: (-sqrt(0.5), -sqrt(0.5)),
+        270: (-1.0, 0.0),
+        315: (-sqrt(0.5), sqrt(0.5))
+    }
+    if normalized in exact:
+        return exact[normalized]
+    return sin(radians(degrees)), cos(radians(degrees))
+
+def _rotatePoints(points: np.ndarray, center: KiPoint, degrees: float) -> np.ndarray:
+    """
+    Rotate an N×2 array of integer points around center by an angle in degrees
+    the same way as KiCAD's RotatePoint, including its rounding.
+    """
+    center = np.array([int(center[0]), int(center[1])], dtype=np.int64)
+    x = points[:, 0] - center[0]
+    y = points[:, 1] - center[1]
+    sinus, cosinus = _kiSinCos(degrees)
+    # KiCAD handles the right angles separately without rounding
+    if (sinus, cosinus) == (0.0, 1.0):
+        rotated = np.column_stack((x, y))
+    elif (sinus, cosinus) == (1.0, 0.0):
+        rotated = np.column_stack((y, -x))
+    elif (sinus, cosinus) == (0.0, -1.0):
+        rotated = np.column_stack((-x, -y))
+    elif (sinus, cosinus) == (-1.0, 0.0):
+        rotated = np.column_stack((-y, x))
+    else:
+        rotated = np.column_stack((_kiRound(y * sinus + x * cosinus),
+                                   _kiRound(y * cosinus - x * sinus)))
+    return rotated + center
+
+def doTransformations(points: Any, rotation: KiAngle, origin: KiPoint,
+                      translation: KiPoint) -> np.ndarray:
+    """
+    Rotate points (an N×2 array-like) around origin and then translate them.
+    This is the transformation of board items when a board is appended to a
+    panel. Returns N×2 array of integer coordinates.
+    """
+    points = np.asarray(points).reshape(-1, 2).astype(np.int64)
+    points = _rotatePoints(points, origin, -1 * rotation.AsDegrees())
+    return points + np.array([int(translation[0]), int(translation[1])], dtype=np.int64)
+
+def undoTransformations(points: Any, rotation: KiAngle, origin: KiPoint,
+                        translation: KiPoint) -> np.ndarray:
+    """
+    Batched version of undoTransformation. Returns N×2 array of integer
+    coordinates.
+    """
+    points = np.asarray(points).reshape(-1, 2).astype(np.int64)
+    points = points - np.array([int(translation[0]), int(translation[1])], dtype=np.int64)
+    return _rotatePoints(points, origin, -1 * rotation.AsDegrees())
+
 def doTransformation(point: KiPoint, rotation: KiAngle, origin: KiPoint, translation: KiPoint) -> VECTOR2I:
     """
-    Abuses KiCAD to perform a tranformation of a point
+    Rotate a point around origin and then translate it
     """
-    segment = pcbnew.PCB_SHAPE()
-    segment.SetShape(STROKE_T.S_SEGMENT)
-    segment.SetStart(toKiCADPoint(point))
-    segment.SetEnd(VECTOR2I(0, 0))
-    segment.Rotate(toKiCADPoint(origin), -1 * rotation)
-    segment.Move(toKiCADPoint(translation))
-    # We build a fresh VECTOR2I - otherwise there is a shared reference
-    return VECTOR2I(segment.GetStartX(), segment.GetStartY())
+    x, y = doTransformations([point[0], point[1]], rotation, origin, translation)[0]
+    return VECTOR2I(int(x), int(y))
 
 def undoTransformation(point, rotation, origin, translation):
     """
@@ -302,15 +380,8 @@ def undoTransformation(point, rotation, origin, translation):
     placing a board. Given a point and original transformation parameters,
     return the original point position.
     """
-    # Abuse PcbNew to do so
-    segment = pcbnew.PCB_SHAPE()
-    segment.SetShape(STROKE_T.S_SEGMENT)
-    segment.SetStart(VECTOR2I(int(point[0]), int(point[1])))
-    segment.SetEnd(VECTOR2I(0, 0))
-    segment.Move(VECTOR2I(-translation[0], -translation[1]))
-    segment.Rotate(origin, -1 * rotation)
-    # We build a fresh VECTOR2I - otherwise there is a shared reference
-    return VECTOR2I(segment.GetStartX(), segment.GetStartY())
+    x, y = undoTransformations([point[0], point[1]], rotation, origin, translation)[0]
+    return VECTOR2I(int(x), int(y))
 
 def removeCutsFromFootprint(footprint):
     """
@@ -326,55 +397,29 @@ def removeCutsFromFootprint(footprint):
         footprint.Remove(e)
     return edges
 
-def renameNets(board, renamer):
-    """
-    Given a board and renaming function (taking original name, returning new
-    name) renames the nets
-    """
-    originalNetNames = collectNetNames(board)
-    netinfo = board.GetNetInfo()
-
-    newNetMapping = { "": netinfo.GetNetItem("") }
-    newNames = set()
-    for name in originalNetNames:
-        newName = renamer(name)
-        newNet = pcbnew.NETINFO_ITEM(board, newName)
-        newNetMapping[name] = newNet
-        board.Add(newNet)
-        newNames.add(newName)
-
-    remapNets(board.GetPads(), newNetMapping)
-    remapNets(board.GetTracks(), newNetMapping)
-    remapNets(board.Zones(), newNetMapping)
-    remapNets((d for d in board.GetDrawings()
-               if hasattr(d, "GetNetname") and d.GetNetname() in newNetMapping), newNetMapping)
-
-    for name in originalNetNames:
-        if name != "" and name not in newNames:
-            board.RemoveNative(netinfo.GetNetItem(name))
-
-def renameRefs(board, renamer, bakeRef):
-    """
-    Given a board and renaming function (taking original name, returning new
-    name) renames the references
-    """
-    for footprint in board.GetFootprints():
-        ref = footprint.Reference()
-        if bakeRef:
-            textObject = pcbnew.PCB_TEXT(board)
-            textObject.SetText(ref.GetText())
-            textObject.SetTextX(ref.GetTextPos()[0])
-            textObject.SetTextY(ref.GetTextPos()[1])
-            textObject.SetTextThickness(ref.GetTextThickness())
-            textObject.SetTextSize(ref.GetTextSize())
-            textObject.SetHorizJustify(ref.GetHorizJustify())
-            textObject.SetVertJustify(ref.GetVertJustify())
-            textObject.SetTextAngle(ref.GetTextAngle())
-            textObject.SetLayer(ref.GetLayer())
-            textObject.SetMirrored(ref.IsMirrored())
-            board.Add(textObject)
-            ref.SetVisible(False)
-        ref.SetText(renamer(ref.GetText()))
+def renameRef(footprint, renamer, bakeRef, board):
+    """
+    Rename reference of a single footprint. If bakeRef is set, the original
+    reference is hidden and a text with it is returned, so it can be added to
+    the board. Otherwise, returns None.
+    """
+    ref = footprint.Reference()
+    textObject = None
+    if bakeRef:
+        textObject = pcbnew.PCB_TEXT(board)
+        textObject.SetText(ref.GetText())
+        textObject.SetTextX(ref.GetTextPos()[0])
+        textObject.SetTextY(ref.GetTextPos()[1])
+        textObject.SetTextThickness(ref.GetTextThickness())
+        textObject.SetTextSize(ref.GetTextSize())
+        textObject.SetHorizJustify(ref.GetHorizJustify())
+        textObject.SetVertJustify(ref.GetVertJustify())
+        textObject.SetTextAngle(ref.GetTextAngle())
+        textObject.SetLayer(ref.GetLayer())
+        textObject.SetMirrored(ref.IsMirrored())
+        ref.SetVisible(False)
+    ref.SetText(renamer(ref.GetText()))
+    return textObject
 
 def isBoardEdge(edge):
     """
@@ -448,18 +493,19 @@ def buildTabs(panel: "Panel", substrate: Substrate,
     Return a pair of lists: tabs and cuts.
     """
     tabs, cuts = [], []
-    for annotation in tabAnnotations:
-        try:
-            t, c = substrate.tab(annotation.origin, annotation.direction,
-                annotation.width, partitionLines, annotation.maxLength, fillet)
-            if t is not None:
-                tabs.append(t)
-                cuts.append(c)
-        except TabError as e:
+    tabAnnotations = list(tabAnnotations)
+    results = substrate.tabs(tabAnnotations, partitionLines, fillet)
+    for annotation, result in zip(tabAnnotations, results):
+        if isinstance(result, TabError):
             panel._renderLines(
                 [constructArrow(annotation.origin, annotation.direction, fromMm(3), fromMm(1))],
                 Layer.Margin)
-            panel.reportError(toKiCADPoint(e.origin), str(e))
+            panel.reportError(toKiCADPoint(result.origin), str(result))
+            continue
+        t, c = result
+        if t is not None:
+            tabs.append(t)
+            cuts.append(c)
     return tabs, cuts
 
 def addFrameFillets(frameGeometry, boardSubstrates, fillet, panel=None):
@@ -539,6 +585,10 @@ def skipBackbones(backbones: List[LineString], skip: int, first: int,
     active = set(itertools.islice(candidates, first - 1, None, skip + 1))
     return [x for x in backbones if key(x) in active]
 
+def _readDruRules(content: bytes) -> List[SExpr]:
+    with io.TextIOWrapper(io.BytesIO(content), encoding="utf-8") as f:
+        return parseSexprListFastF(f)
+
 def bakeTextVars(board: pcbnew.BOARD) -> None:
     """
     Given a board, expand text variables in all text items on the board.
@@ -560,6 +610,22 @@ class VCutSettings:
     textOffset: KiLength = fromMm(3)
     clearance: KiLength = 0
 
+@dataclass
+class RotatedSourceItems:
+    """
+    Copies of the items of a source board rotated to their orientation in the
+    panel. The edges of the footprints are already removed; boundingBox spans
+    all the board edges. copyToSourceId maps identifiers of the copies to the
+    identifiers of the original items.
+    """
+    footprints: List[Tuple[pcbnew.FOOTPRINT, bool]] # (footprint, isAnnotation)
+    tracks: List[pcbnew.BOARD_ITEM]
+    drawings: List[pcbnew.BOARD_ITEM]
+    bakedRefs: List[pcbnew.PCB_TEXT]
+    zones: List[pcbnew.ZONE]
+    boundingBox: BOX2I
+    copyToSourceId: Dict[str, str]
+
 
 class Panel:
     """
@@ -591,8 +657,16 @@ class Panel:
         self.board = pcbnew.NewBoard(panelFilename)
         self.sourcePaths = set() # A set of all board files that were appended to the panel
         self.substrates = [] # Substrates of the individual boards; e.g. for masking
-        self.boardSubstrate = Substrate([]) # Keep substrate in internal representation,
-                                            # Draw it just before saving
+        # Substrates of the source boards in source coordinates, the appended
+        # boards are their transformed copies
+        self.substrateTemplates: Dict[Tuple[Any, ...], Substrate] = {}
+        # Loaded source boards, they are shared by all their instances
+        self.sourceBoards: Dict[Tuple[Any, ...], pcbnew.BOARD] = {}
+        # Rotated items of the source boards reused by makeGrid(bulkTransform=True)
+        self.rotatedSourceItems: Dict[Tuple[Any, ...], RotatedSourceItems] = {}
+        # Keep substrate in internal representation, draw it just before
+        # saving. The pieces are merged lazily as the panel grows.
+        self.boardSubstrate = Substrate([], deferUnion=True)
         self.backboneLines = []
         self.hVCuts = set() # Keep V-cuts as numbers and append them just before saving
         self.vVCuts = set() # to make them truly span the whole panel
@@ -653,13 +727,8 @@ class Panel:
         Saves the panel to a file and makes the requested changes to the prl and
         pro files.
         """
-        panelEdges = self.boardSubstrate.serialize(reconstructArcs)
-        boardsEdges = self._getRefillEdges(reconstructArcs)
-
-        for e in panelEdges:
-            e.SetWidth(edgeWidth)
-        for e in boardsEdges:
-            e.SetWidth(edgeWidth)
+        panelEdges = self.boardSubstrate.serialize(reconstructArcs, edgeWidth)
+        boardsEdges = self._getRefillEdges(reconstructArcs, edgeWidth)
 
         self._validateVCuts()
         vcuts = self._renderVCutH() + self._renderVCutV()
@@ -707,7 +776,8 @@ class Panel:
         for edge in panelEdges:
             fillBoard.Add(edge)
         if self.vCutSettings.layer == Layer.Edge_Cuts:
-            vcuts = self._renderVCutH() + self._renderVCutV()
+            # The V-cuts were removed from the panel board above, so we can
+            # reuse them instead of rendering them again
             for cut, _ in vcuts:
                 fillBoard.Add(cut)
 
@@ -733,19 +803,20 @@ class Panel:
         self.writeCustomDrcRules()
 
 
-    def _getRefillEdges(self, reconstructArcs: bool):
+    def _getRefillEdges(self, reconstructArcs: bool, edgeWidth: Optional[KiLength]=None):
         """
         Builds a list of edges that represent boards outlines and panel
         surrounding as independent pieces of substrate
         """
-        boardsEdges = list(chain(*[sub.serialize(reconstructArcs) for sub in self.substrates]))
+        boardsEdges = buildEdgeShapes(chain(*[sub.serializeRecords(reconstructArcs)
+                                              for sub in self.substrates]), edgeWidth)
 
         surrounding = self.boardSubstrate.substrates.simplify(fromMm(0.01)).difference(
             shapely.ops.unary_union(list(
                 sub.substrates.buffer(fromMm(0.2)) for sub in self.substrates)).simplify(fromMm(0.01)))
         surroundingSubstrate = Substrate([])
         surroundingSubstrate.union(surrounding)
-        boardsEdges += surroundingSubstrate.serialize()
+        boardsEdges += surroundingSubstrate.serialize(width=edgeWidth)
         return boardsEdges
 
     def _uniquePrefix(self):
@@ -935,8 +1006,7 @@ class Panel:
                 # If the source board doesn't contain DRU files, there's nothing to
                 # inherit.
                 return
-            with open(druFilename, encoding="utf-8") as f:
-                rules = parseSexprListF(f)
+            rules = cachedParse("dru", druFilename, _readDruRules)
         except FileNotFoundError:
             # If the source board doesn't contain DRU files, there's nothing to
             # inherit.
@@ -971,15 +1041,8 @@ class Panel:
         if self.pageSize is None:
             return
         with open(self.filename, "r", encoding="utf-8") as f:
-            tree = parseSexprF(f, limit=10) # Introduce limit to speed up parsing
-        # Find paper property
-        paperExpr = None
-        for subExpr in tree:
-            if not isinstance(subExpr, SExpr):
-                continue
-            if len(subExpr) > 0 and isinstance(subExpr[0], Atom) and subExpr[0].value == "paper":
-                paperExpr = subExpr
-                break
+            tree = parseSexprLazyF(f) # Parse only the nodes we look at
+        paperExpr = findNode(tree, "paper")
         assert paperExpr is not None
 
         if isinstance(self.pageSize, str):
@@ -999,8 +1062,9 @@ class Panel:
                 Atom(str(pageSize[1]), " "),
             ]
 
+        # Only the paper node is serialized, the rest is copied from the source
         with open(self.filename, "w", encoding="utf-8") as f:
-            f.write(str(tree))
+            dumpSexprF(tree, f)
 
 
     def inheritDesignSettings(self, board):
@@ -1040,7 +1104,7 @@ class Panel:
         # we have to read out the page size from the source board and save it so
         # we can recover it.
         with open(board.GetFileName(), "r", encoding="utf-8") as f:
-            tree = parseSexprF(f, limit=10) # Introduce limit to speed up parsing
+            tree = parseSexprLazyF(f) # Parse only the nodes we look at
         self._inheritedPageDimensions = getPageDimensionsFromAst(tree)
 
     def setPageSize(self, size: Union[str, Tuple[int, int]] ) -> None:
@@ -1098,7 +1162,8 @@ class Panel:
                     netRenamer: Optional[Callable[[int, str], str]] = None,
                     refRenamer: Optional[Callable[[int, str], str]] = None,
                     inheritDrc: bool = True, interpretAnnotations: bool=True,
-                    bakeText: bool = False, bakeRef: bool = False):
+                    bakeText: bool = False, bakeRef: bool = False,
+                    bulkTransform: bool = False):
         """
         Appends a board to the panel.
 
@@ -1125,6 +1190,10 @@ class Panel:
 
         Similarly, you can substitute variables in the text via bakeText.
 
+        When you append the same board many times, set bulkTransform. The
+        rotated board items are then computed only once for each rotation and
+        every further instance only translates their copies.
+
         Returns bounding box (BOX2I) of the extracted area placed at the
         destination and the extracted substrate of the board.
         """
@@ -1135,11 +1204,11 @@ class Panel:
             raise RuntimeError("Board rotation has to be passed as EDA_ANGLE, not a number")
 
 
-        board = LoadBoard(str(filename))
+        # The source board is shared by all instances, so it has to stay
+        # untouched; we transform copies of its items.
+        board = self._loadSourceBoard(filename, bakeText)
         if inheritDrc:
             self.sourcePaths.add(filename)
-        if bakeText:
-            bakeTextVars(board)
 
         thickness = board.GetDesignSettings().GetBoardThickness()
         if len(self.substrates) == 0:
@@ -1173,53 +1242,78 @@ class Panel:
         self._inheritNetClasses(board, netRenamerFn)
         self._inheriCustomDrcRules(board, netRenamerFn)
 
-        renameNets(board, netRenamerFn)
-        if refRenamer is not None:
-            renameRefs(board, lambda x: refRenamer(len(self.substrates), x), bakeRef)
+        netMapping = self._addRenamedNets(board, netRenamerFn)
 
         drawings = collectItems(board.GetDrawings(), enlargedSourceArea)
         footprints = collectFootprints(board.GetFootprints(), enlargedSourceArea)
         tracks = collectItems(board.GetTracks(), enlargedSourceArea)
         zones = collectZones(board.Zones(), enlargedSourceArea)
 
+        template = self._getSubstrateTemplate(filename, sourceArea, tolerance,
+                                              footprints, drawings)
+
+        bakeRefs = refRenamer is not None and bakeRef
+        if bulkTransform:
+            # The rotated items are shared by all instances with the same
+            # rotation; each instance only translates their copies.
+            key = (id(board), tuple(enlargedSourceArea.GetPosition()),
+                   tuple(enlargedSourceArea.GetSize()), tuple(originPoint),
+                   rotationAngle.AsDegrees(), interpretAnnotations, bakeRefs)
+            rotated = self.rotatedSourceItems.get(key)
+            if rotated is None:
+                rotated = self._rotateSourceItems(footprints, tracks, drawings,
+                    zones, enlargedSourceArea, originPoint, rotationAngle,
+                    interpretAnnotations, bakeRefs)
+                self.rotatedSourceItems[key] = rotated
+        else:
+            rotated = self._rotateSourceItems(footprints, tracks, drawings,
+                zones, enlargedSourceArea, originPoint, rotationAngle,
+                interpretAnnotations, bakeRefs)
+
         itemMapping: Dict[str, str] = {} # string KIID to string KIID
-        def yieldMapping(old: str, new: str) -> None:
-            nonlocal itemMapping
-            itemMapping[old] = new
+        if bulkTransform:
+            def yieldMapping(old: str, new: str) -> None:
+                itemMapping[rotated.copyToSourceId[old]] = new
+            def place(item, mapping=None):
+                return duplicateItem(item, mapping)
+        else:
+            # The rotated items are used directly
+            itemMapping = {sourceId: copyId
+                           for copyId, sourceId in rotated.copyToSourceId.items()}
+            yieldMapping = None
+            def place(item, mapping=None):
+                return item
 
-        edges = []
         annotations = []
-        for footprint in footprints:
-            # We want to rotate text within footprints by the requested amount,
-            # even if that text has "keep upright" attribute set. For that,
-            # the attribute must be first removed without changing the
-            # orientation of the text.
-            for item in (*footprint.GraphicalItems(), footprint.Value(), footprint.Reference()):
-                if isinstance(item, pcbnew.PCB_FIELD) and item.IsKeepUpright():
-                    actualOrientation = item.GetDrawRotation()
-                    item.SetKeepUpright(False)
-                    alteredOrientation = item.GetDrawRotation()
-                    item.SetTextAngle(item.GetTextAngle() + (alteredOrientation - actualOrientation))
-            footprint.Rotate(originPoint, rotationAngle)
+        for rotatedFootprint, isAnnotation in rotated.footprints:
+            footprint = place(rotatedFootprint, None if isAnnotation else yieldMapping)
+            for item in chain(footprint.Pads(), footprint.Zones()):
+                item.SetNet(netMapping[item.GetNetname()])
+            if refRenamer is not None:
+                renameRef(footprint, lambda x: refRenamer(len(self.substrates), x),
+                          False, self.board)
             footprint.Move(translation)
-            edges += removeCutsFromFootprint(footprint)
-            if interpretAnnotations and self.annotationReader.isAnnotation(footprint):
+            if isAnnotation:
                 annotations.extend(self.annotationReader.convertToAnnotation(footprint))
             else:
-                appendItem(self.board, footprint, yieldMapping)
-        for track in tracks:
-            track.Rotate(originPoint, rotationAngle)
+                self.board.Add(footprint)
+        for rotatedTrack in rotated.tracks:
+            track = place(rotatedTrack, yieldMapping)
+            track.SetNet(netMapping[track.GetNetname()])
             track.Move(translation)
-            appendItem(self.board, track, yieldMapping)
-        for netId in board.GetNetInfo().NetsByNetcode():
-            self.board.Add(board.GetNetInfo().GetNetItem(netId))
+            self.board.Add(track)
 
-        # Treat drawings differently since they contains board edges
-        for drawing in drawings:
-            drawing.Rotate(originPoint, rotationAngle)
+        otherDrawings = []
+        for rotatedDrawing in rotated.drawings:
+            drawing = place(rotatedDrawing, yieldMapping)
+            if hasattr(drawing, "GetNetname") and drawing.GetNetname() in netMapping:
+                drawing.SetNet(netMapping[drawing.GetNetname()])
             drawing.Move(translation)
-        edges += [edge for edge in drawings if isBoardEdge(edge)]
-        otherDrawings = [edge for edge in drawings if not isBoardEdge(edge)]
+            otherDrawings.append(drawing)
+        for rotatedRef in rotated.bakedRefs:
+            bakedRef = place(rotatedRef)
+            bakedRef.Move(translation)
+            otherDrawings.append(bakedRef)
 
         def makeRevertTransformation(angle, origin, translation):
             def f(point):
@@ -1227,26 +1321,27 @@ class Panel:
             return f
 
         revertTransformation = makeRevertTransformation(rotationAngle, originPoint, translation)
-        try:
-            s = Substrate(edges, 0,
-                revertTransformation=revertTransformation)
-            self.boardSubstrate.union(s)
-            self.substrates.append(s)
-            self.substrates[-1].annotations = annotations
-        except substrate.PositionError as e:
-            point = undoTransformation(e.point, rotationAngle, originPoint, translation)
-            raise substrate.PositionError(f"{filename}: {e.origMessage}", point)
+        s = template.transformed(rotationAngle, originPoint, translation,
+                                 revertTransformation=revertTransformation)
+        self.boardSubstrate.union(s)
+        self.substrates.append(s)
+        self.substrates[-1].annotations = annotations
         for drawing in otherDrawings:
-            appendItem(self.board, drawing, yieldMapping)
-        for zone in zones:
-            zone.Rotate(originPoint, rotationAngle)
+            self.board.Add(drawing)
+        for rotatedZone in rotated.zones:
+            zone = place(rotatedZone, yieldMapping)
+            zone.SetNet(netMapping[zone.GetNetname()])
             zone.Move(translation)
             cropZoneByPolygon(zone, s.exterior())
-            appendItem(self.board, zone, yieldMapping)
+            self.board.Add(zone)
 
         try:
             exclusions = readBoardDrcExclusions(board)
             for drcE in exclusions:
+                if any(isBoardEdge(x) for x in drcE.objects):
+                    # Board edges are not placed, not even those of footprints
+                    # which are mapped, but removed from the footprint
+                    continue
                 try:
                     newObjects = [resolveItem(self.board, pcbnew.KIID(itemMapping[x.m_Uuid.AsString()])) for x in drcE.objects]
                     assert all(x is not None for x in newObjects)
@@ -1263,7 +1358,137 @@ class Panel:
 
         self.projectVars.append(self._readProjectVariables(board))
 
-        return findBoundingBox(edges)
+        box = rotated.boundingBox
+        return BOX2I(box.GetPosition() + translation, box.GetSize())
+
+    def _rotateSourceItems(self, footprints: List[pcbnew.FOOTPRINT],
+                           tracks: List[pcbnew.BOARD_ITEM],
+                           drawings: List[pcbnew.BOARD_ITEM],
+                           zones: List[pcbnew.ZONE], enlargedSourceArea: BOX2I,
+                           originPoint: VECTOR2I, rotationAngle: KiAngle,
+                           interpretAnnotations: bool,
+                           bakeRefs: bool) -> RotatedSourceItems:
+        """
+        Make copies of the source items rotated around originPoint. The source
+        items are left untouched.
+        """
+        copyToSourceId: Dict[str, str] = {}
+        def yieldMapping(old: str, new: str) -> None:
+            copyToSourceId[new] = old
+
+        edges = []
+        rotatedFootprints = []
+        bakedRefs = []
+        for sourceFootprint in footprints:
+            isAnnotation = interpretAnnotations and \
+                self.annotationReader.isAnnotation(sourceFootprint)
+            footprint = duplicateItem(sourceFootprint,
+                                      None if isAnnotation else yieldMapping)
+            if bakeRefs:
+                bakedRef = renameRef(footprint, lambda x: x, True, self.board)
+                if fitsIn(bakedRef.GetBoundingBox(), enlargedSourceArea):
+                    bakedRef.Rotate(originPoint, rotationAngle)
+                    bakedRefs.append(bakedRef)
+            # We want to rotate text within footprints by the requested amount,
+            # even if that text has "keep upright" attribute set. For that,
+            # the attribute must be first removed without changing the
+            # orientation of the text.
+            for item in (*footprint.GraphicalItems(), footprint.Value(), footprint.Reference()):
+                if isinstance(item, pcbnew.PCB_FIELD) and item.IsKeepUpright():
+                    actualOrientation = item.GetDrawRotation()
+                    item.SetKeepUpright(False)
+                    alteredOrientation = item.GetDrawRotation()
+                    item.SetTextAngle(item.GetTextAngle() + (alteredOrientation - actualOrientation))
+            footprint.Rotate(originPoint, rotationAngle)
+            edges += removeCutsFromFootprint(footprint)
+            rotatedFootprints.append((footprint, isAnnotation))
+
+        rotatedTracks = []
+        for sourceTrack in tracks:
+            track = duplicateItem(sourceTrack, yieldMapping)
+            track.Rotate(originPoint, rotationAngle)
+            rotatedTracks.append(track)
+
+        # Treat drawings differently since they contains board edges
+        rotatedDrawings = []
+        for sourceDrawing in drawings:
+            boardEdge = isBoardEdge(sourceDrawing)
+            drawing = duplicateItem(sourceDrawing, None if boardEdge else yieldMapping)
+            drawing.Rotate(originPoint, rotationAngle)
+            if boardEdge:
+                edges.append(drawing)
+            else:
+                rotatedDrawings.append(drawing)
+
+        rotatedZones = []
+        for sourceZone in zones:
+            zone = duplicateItem(sourceZone, yieldMapping)
+            zone.Rotate(originPoint, rotationAngle)
+            rotatedZones.append(zone)
+
+        return RotatedSourceItems(
+            footprints=rotatedFootprints,
+            tracks=rotatedTracks,
+            drawings=rotatedDrawings,
+            bakedRefs=bakedRefs,
+            zones=rotatedZones,
+            boundingBox=findBoundingBox(edges),
+            copyToSourceId=copyToSourceId)
+
+    def _loadSourceBoard(self, filename: Union[str, Path], bakeText: bool) -> pcbnew.BOARD:
+        """
+        Load a source board. Every board is loaded only once; the panel then
+        takes copies of its items, so the loaded board is never modified.
+        """
+        key = (os.path.abspath(filename), os.path.getmtime(filename), bakeText)
+        board = self.sourceBoards.get(key)
+        if board is None:
+            board = LoadBoard(str(filename))
+            if bakeText:
+                bakeTextVars(board)
+            self.sourceBoards[key] = board
+        return board
+
+    def _addRenamedNets(self, board: pcbnew.BOARD, renamer: Callable[[str], str]) \
+            -> Dict[str, pcbnew.NETINFO_ITEM]:
+        """
+        Add nets of the source board renamed via renamer to the panel. Return a
+        mapping from the source net names to the panel nets.
+        """
+        netMapping = { "": self.board.GetNetInfo().GetNetItem("") }
+        for name in collectNetNames(board):
+            newName = renamer(name)
+            net = self.board.FindNet(newName)
+            if net is None:
+                net = pcbnew.NETINFO_ITEM(self.board, newName)
+                self.board.Add(net)
+            netMapping[name] = net
+        return netMapping
+
+    def _getSubstrateTemplate(self, filename: Union[str, Path], sourceArea: BOX2I,
+                              tolerance: KiLength, footprints: List[pcbnew.FOOTPRINT],
+                              drawings: List[pcbnew.BOARD_ITEM]) -> Substrate:
+        """
+        Return the substrate of the source board in source coordinates. The
+        outline is reconstructed only once for each source board and area; the
+        individual instances of the board are transformed copies.
+        """
+        key = (os.path.abspath(filename), os.path.getmtime(filename),
+               sourceArea.GetX(), sourceArea.GetY(),
+               sourceArea.GetWidth(), sourceArea.GetHeight(), tolerance)
+        template = self.substrateTemplates.get(key)
+        if template is not None:
+            return template
+        edges = [edge for footprint in footprints
+                      for edge in footprint.GraphicalItems()
+                      if edge.GetLayer() == Layer.Edge_Cuts]
+        edges += [edge for edge in drawings if isBoardEdge(edge)]
+        try:
+            template = Substrate(edges, 0)
+        except substrate.PositionError as e:
+            raise substrate.PositionError(f"{filename}: {e.origMessage}", e.point)
+        self.substrateTemplates[key] = template
+        return template
 
     def _readProjectVariables(self, board: pcbnew.BOARD) -> Dict[str, str]:
         projectPath = self.getProFilepath(board.GetFileName())
@@ -1422,7 +1647,8 @@ class Panel:
                  destination: VECTOR2I, placer: GridPlacerBase,
                  rotation: KiAngle=fromDegrees(0), netRenamePattern: str="Board_{n}-{orig}",
                  refRenamePattern: str="Board_{n}-{orig}", tolerance: KiLength=0,
-                 bakeText: bool=False, bakeRef: bool=False) \
+                 bakeText: bool=False, bakeRef: bool=False,
+                 bulkTransform: bool=False) \
                      -> List[Substrate]:
         """
         Place the given board in a grid pattern with given spacing. The board
@@ -1477,6 +1703,10 @@ class Panel:
 
         bakeText - substitute variables in text elements
 
+        bulkTransform - rotate the board items only once per distinct rotation
+        and only translate their copies for the individual boards (see
+        appendBoard)
+
         Returns a list of the placed substrates. You can use these to generate
         tabs, frames, backbones, etc.
         """
@@ -1495,7 +1725,8 @@ class Panel:
                 boardfile, dest, sourceArea=sourceArea,
                 tolerance=tolerance, origin=Origin.Center,
                 rotationAngle=boardRotation, netRenamer=netRenamer,
-                refRenamer=refRenamer, bakeText=bakeText, bakeRef=bakeRef)
+                refRenamer=refRenamer, bakeText=bakeText, bakeRef=bakeRef,
+                bulkTransform=bulkTransform)
             if not topLeftSize:
                 topLeftSize = boardSize
 
@@ -1730,7 +1961,7 @@ class Panel:
         Take a list of cuts and perform mouse bites. The cuts can be prolonged
         to
         """
-        bloatedSubstrate = prep(self.boardSubstrate.substrates.buffer(SHP_EPSILON))
+        bloatedSubstrate = self.boardSubstrate.prepared(SHP_EPSILON)
         offsetCuts = []
         for cut in cuts:
             cut = cut.simplify(SHP_EPSILON) # Remove self-intersecting geometry
@@ -0,0 +1,191 @@
+"""
+Opt-in on-disk cache of parsed source files.
+
+KiKit commands are often invoked over and over on the same files (e.g., a fab
+export of many product variants sharing the same hierarchical sheets). The
+cache stores the results of parsing such files keyed by the file path, its
+content and the parsing parameters, so the repeated invocations skip parsing
+entirely.
+
+The cache is disabled by default. Set the environmental variable
+KIKIT_PARSE_CACHE to a directory to enable it. The size of the cache is bounded
+by KIKIT_PARSE_CACHE_SIZE (in megabytes, 256 by default); the least recently
+used entries are evicted first.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Optional, Tuple
+
+# Bump whenever the structure of the cached objects changes
+CACHE_VERSION = 2
+DEFAULT_CACHE_SIZE = 256 # MB
+
+_SUFFIX = ".pickle"
+
+class ParseCache:
+    """
+    Directory of pickled parse results with size-bounded LRU eviction. The
+    modification time of an entry is used as its last access time.
+
+    Listing the directory is expensive, so the cache keeps a running estimate
+    of its size and evicts only when the estimate exceeds the limit. The
+    estimate doesn't include entries written by other processes since the first
+    write; they are accounted for by the next eviction.
+    """
+    def __init__(self, directory: str, maxSize: int) -> None:
+        self.directory = directory
+        self.maxSize = maxSize
+        self._sizeEstimate: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, kind: str, filename: str, content: bytes,
+            params: Tuple=()) -> str:
+        """
+        Build a key for a result of parsing filename with the given content.
+        Kind distinguishes the different parsers, params captures anything else
+        the result depends on.
+        """
+        contentHash = hashlib.sha256(content).hexdigest()
+        identity = repr((CACHE_VERSION, kind, os.path.abspath(filename),
+                         contentHash, params))
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _entryPath(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key: str) -> Any:
+        """
+        Return the value for the key, raise KeyError if there is none.
+        """
+        path = self._entryPath(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            raise KeyError(key) from None
+        except Exception:
+            # Corrupted or incompatible entry, treat it as a miss
+            self._remove(path)
+            raise KeyError(key) from None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        # Write the entry atomically so concurrent invocations of KiKit never
+        # see a partial entry
+        fd, tmpPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            entrySize = os.path.getsize(tmpPath)
+            os.replace(tmpPath, self._entryPath(key))
+        except Exception:
+            self._remove(tmpPath)
+            raise
+        if self._sizeEstimate is None:
+            self._sizeEstimate = self.size()
+        else:
+            self._sizeEstimate += entrySize
+        if self._sizeEstimate > self.maxSize:
+            self.evict()
+
+    def fetch(self, kind: str, filename: str, compute: Callable[[bytes], Any],
+              params: Tuple=()) -> Any:
+        """
+        Return the cached result of parsing filename. If there is none, invoke
+        compute with the content of the file and store its result. The file is
+        read only once, so the key and the result always match.
+        """
+        with open(filename, "rb") as f:
+            content = f.read()
+        key = self.key(kind, filename, content, params)
+        try:
+            return self.get(key)
+        except KeyError:
+            pass
+        value = compute(content)
+        self.put(key, value)
+        return value
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until the cache fits its size.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        entries.sort(key=lambda entry: entry[2])
+        for path, size, _ in entries:
+            if total <= self.maxSize:
+                break
+            self._remove(path)
+            total -= size
+        self._sizeEstimate = total
+
+    def clear(self) -> None:
+        for path, _, _ in self._entries():
+            self._remove(path)
+        self._sizeEstimate = 0
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue # Removed by a concurrent process
+                entries.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+_defaultCache: Tuple[Tuple[str, str], Optional[ParseCache]] = (("", ""), None)
+
+def defaultParseCache() -> Optional[ParseCache]:
+    """
+    Return the cache configured by the environment or None if caching is
+    disabled. The instance is reused as long as the configuration doesn't
+    change.
+    """
+    global _defaultCache
+    config = (os.environ.get("KIKIT_PARSE_CACHE", "").strip(),
+              os.environ.get("KIKIT_PARSE_CACHE_SIZE", "").strip())
+    if config == _defaultCache[0]:
+        return _defaultCache[1]
+    directory, size = config
+    if directory == "":
+        cache = None
+    else:
+        maxSize = float(size) if size else DEFAULT_CACHE_SIZE
+        cache = ParseCache(directory, int(maxSize * 1024 * 1024))
+    _defaultCache = (config, cache)
+    return cache
+
+def cachedParse(kind: str, filename: str, compute: Callable[[bytes], Any],
+                params: Tuple=()) -> Any:
+    """
+    Return compute(content) - the result of parsing filename - from the default
+    cache if it is enabled. Note that the result is a fresh copy on every cache
+    hit.
+    """
+    cache = defaultParseCache()
+    if cache is None:
+        with open(filename, "rb") as f:
+            return compute(f.read())
+    return cache.fetch(kind, filename, compute, params)
@@ -1,5 +1,11 @@
+import gc
+import mmap
+import re
+from array import array
+from contextlib import contextmanager
+from enum import Enum
 from io import StringIO
-from typing import Callable, Dict, Iterable, Optional, Union
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
 
 # Simple white-space aware S-Expression parser (parsing and dumping yields the
 # same result). Might not support all features of S-expression, but should be
@@ -221,6 +227,29 @@ class Stream:
         return not self._fill_buffer()
 
 
+class _StringTable(dict):
+    """
+    Per-parse table of strings shared by the nodes of the resulting tree. Large
+    files consist mostly of the same indentation strings, keywords, layer names
+    and numbers; storing a single copy of each makes the tree considerably
+    smaller. Indexing the table interns the key.
+
+    Only the regex-based backends use the table. The lookups would slow down
+    the character-by-character stream parser considerably, so it doesn't.
+    """
+    # Longer atoms are mostly unique (UUIDs, texts), so it makes no sense to
+    # look them up.
+    MAX_ATOM_LENGTH = 32
+
+    def __missing__(self, key):
+        self[key] = key
+        return key
+
+    def intern(self, value):
+        if len(value) > self.MAX_ATOM_LENGTH:
+            return value
+        return self[value]
+
 class Atom:
     __slots__ = ['value', 'quoted', 'leadingWhitespace']
 
@@ -261,11 +290,20 @@ class SExpr:
     def __str__(self):
         # TBA: we should validate that two atoms do not get squished together
         # as they have wrongly specified whitespace
-        return (self.leadingWhitespace + "("
-            + "".join([str(x) for x in self.items])
-            + self.trailingWhitespace
-            + (")" if self.complete else "")
-            + self.trailingOuterWhitespace)
+        pieces = []
+        emitSexpr(self, pieces.append)
+        return "".join(pieces)
+
+    def _parts(self):
+        """
+        Return serialization of the expression as a triplet prefix, children,
+        suffix.
+        """
+        return (self.leadingWhitespace + "(",
+                self.items,
+                self.trailingWhitespace
+                    + (")" if self.complete else "")
+                    + self.trailingOuterWhitespace)
 
     def __repr__(self):
         val = [x.__repr__() for x in self.items]
@@ -313,60 +351,68 @@ def readSexpr(stream, limit=None):
     """
     Reads SExpression from the stream. You can optionally try to parse only the
     first n nodes by specifying limit;
+
+    The nesting is tracked by an explicit stack, so deeply nested expressions
+    do not hit the recursion limit.
     """
+    read = stream.read
+    back = stream.back
     stream.shift("(")
 
-    expr = SExpr()
+    root = SExpr()
+    stack = []
+    expr = root
     whitespace = ""
 
     while True:
-        c = stream.read()
-        if not c:  # EOF
-            raise ParseError("Unexpected end of file within expression")
-
-        if c == ")" and (limit is None or limit > 0):
-            expr.trailingWhitespace = whitespace
-            expr.complete = True
-            break
-
-        # Put the character back to be processed by the appropriate reader
-        stream.back()
-
-        if limit is not None and limit <= 0:
+        c = read()
+        # Limit applies only to the top-level expression
+        if limit is not None and limit <= 0 and expr is root and c:
             # We've read enough nodes, capture the rest
-            expr.trailingWhitespace = whitespace + stream.readAll()
-            expr.complete = False
-            break
+            back()
+            root.trailingWhitespace = whitespace + stream.readAll()
+            root.complete = False
+            return root
 
-        if c == "#":
-            # Read comment (including the #) and treat it as whitespace
-            # so it is preserved in leadingWhitespace of the next node.
-            # The # was already put back by stream.back() above.
-            comment = stream.readUntilEndOfLine()
-            whitespace += comment
-        elif c.isspace():
-            whitespace += stream.readUntilEndOfWhitespace()
+        if c == ")":
+            expr.trailingWhitespace = whitespace
+            whitespace = ""
+            if not stack:
+                return root
+            expr = stack.pop()
         elif c == "(":
-            s = readSexpr(stream)
-            s.leadingWhitespace = whitespace
+            s = SExpr(leadingWhitespace=whitespace)
             expr.items.append(s)
-            if limit is not None:
+            if limit is not None and expr is root:
                 limit -= 1
             whitespace = ""
+            stack.append(expr)
+            expr = s
+        elif not c:  # EOF
+            raise ParseError("Unexpected end of file within expression")
+        elif c == "#":
+            # Read comment (including the #) and treat it as whitespace
+            # so it is preserved in leadingWhitespace of the next node.
+            back()
+            whitespace += stream.readUntilEndOfLine()
+        elif c.isspace():
+            back()
+            whitespace += stream.readUntilEndOfWhitespace()
         else:
+            # Put the character back to be processed by the atom reader
+            back()
             a = stream.readAtom()
             a.leadingWhitespace = whitespace
             expr.items.append(a)
-            if limit is not None:
+            if limit is not None and expr is root:
                 limit -= 1
             whitespace = ""
 
-    return expr
-
 def parseSexprF(sourceStream, limit=None, buffer_size=4096):
     stream = Stream(sourceStream, buffer_size=buffer_size)
     lw = stream.readUntilEndOfWhitespace()
-    s = readSexpr(stream, limit=limit)
+    with _gcPaused():
+        s = readSexpr(stream, limit=limit)
     s.leadingWhitespace = lw
     s.trailingOuterWhitespace = stream.readUntilEndOfWhitespace()
     return s
@@ -385,13 +431,664 @@ def parseSexprListF(sourceStream, limit=None, buffer_size=4096):
         if stream.isEOF():
             break
 
-        s = readSexpr(stream, limit=limit)
+        with _gcPaused():
+            s = readSexpr(stream, limit=limit)
         s.leadingWhitespace = lw
         s.trailingOuterWhitespace = readWhitespaceWithComments(stream)
         sexprs.append(s)
 
     return sexprs
 
+class SexprEvent(Enum):
+    ENTER = 0 # An expression starts, payload is its leading whitespace
+    ATOM = 1  # An atom, payload is the Atom
+    EXIT = 2  # An expression ends, payload is its trailing whitespace
+
+def iterSexprEventsF(sourceStream, buffer_size=65536) \
+        -> Iterator[Tuple[SexprEvent, Union[str, Atom]]]:
+    """
+    Read a top-level S-Expression from the stream and yield parsing events
+    instead of building the tree. The stream is read in chunks, so arbitrarily
+    large files can be processed in constant memory.
+    """
+    buffer = _ChunkBuffer(sourceStream, buffer_size)
+    m = buffer.nextToken()
+    buffer.expectOpening(m)
+    buffer.pos = m.end()
+    yield SexprEvent.ENTER, m.group(1)
+
+    depth = 1
+    while True:
+        m = buffer.nextToken()
+        kind = m.lastindex
+        buffer.pos = m.end()
+        if kind == _TOKEN_OPEN:
+            depth += 1
+            yield SexprEvent.ENTER, m.group(1)
+        elif kind == _TOKEN_CLOSE:
+            yield SexprEvent.EXIT, m.group(1)
+            depth -= 1
+            if depth == 0:
+                return
+        elif kind == _TOKEN_UNTERMINATED:
+            raise ParseError("Unexpected end of file in quoted string")
+        elif kind == _TOKEN_EOF:
+            raise ParseError("Unexpected end of file within expression")
+        else:
+            yield SexprEvent.ATOM, Atom(m.group(kind), m.group(1),
+                                        kind == _TOKEN_QUOTED)
+
+def iterSexprChildrenF(sourceStream, buffer_size=65536) -> Iterator["AstNode"]:
+    """
+    Read a top-level S-Expression from the stream and yield its children (atoms
+    and complete expressions) one by one. Only a single child is kept in memory
+    at a time.
+    """
+    buffer = _ChunkBuffer(sourceStream, buffer_size)
+    strings = _StringTable()
+    intern = strings.intern
+    m = buffer.nextToken()
+    buffer.expectOpening(m)
+    buffer.pos = m.end()
+    while True:
+        m = buffer.nextToken()
+        kind = m.lastindex
+        if kind == _TOKEN_OPEN:
+            # A child is parsed by the fast backend once it is fully buffered.
+            # It cannot be parsed successfully before its closing parenthesis
+            # is read, so a failure means we need more input.
+            try:
+                with _gcPaused():
+                    node, end = _readSexprFast(buffer.text, m.end(1), strings=strings)
+            except ParseError:
+                if buffer.eof:
+                    raise
+                buffer.readMore()
+                continue
+            node.leadingWhitespace = strings[m.group(1)]
+            buffer.pos = end
+            yield node
+            continue
+        buffer.pos = m.end()
+        if kind == _TOKEN_CLOSE:
+            return # End of the top-level expression
+        if kind == _TOKEN_UNTERMINATED:
+            raise ParseError("Unexpected end of file in quoted string")
+        if kind == _TOKEN_EOF:
+            raise ParseError("Unexpected end of file within expression")
+        yield Atom(intern(m.group(kind)), strings[m.group(1)], kind == _TOKEN_QUOTED)
+
+# The fast backend tokenizes the whole buffer with a single compiled regex
+# instead of going character by character through Stream. Each match consumes
+# the whitespace (including comments) preceding a token and the token itself;
+# the index of the last matched group identifies the token kind. Note that the
+# token alternatives cover every possible input (including the end of input),
+# so the regex always matches without backtracking into the whitespace.
+_TOKEN_RE = re.compile(r'((?:\s+|#[^\n]*\n?)*)(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"][^\s()]*)|(")|(\Z))', re.S)
+_WHITESPACE_RE = re.compile(r"\s*")
+_WHITESPACE_COMMENTS_RE = re.compile(r"(?:\s+|#[^\n]*\n?)*")
+
+_TOKEN_OPEN = 2
+_TOKEN_CLOSE = 3
+_TOKEN_QUOTED = 4
+_TOKEN_ATOM = 5
+_TOKEN_UNTERMINATED = 6
+_TOKEN_EOF = 7
+
+class _ChunkBuffer:
+    """
+    Input of the streaming parsers: the not yet consumed part of the stream
+    read in chunks that the fast tokenizer can scan.
+    """
+    def __init__(self, stream, chunkSize):
+        self.stream = stream
+        self.chunkSize = chunkSize
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def readMore(self):
+        """
+        Drop the consumed text and append a new chunk. The chunk is at least as
+        large as the text kept, so a long expression is re-scanned only a
+        logarithmic number of times.
+        """
+        rest = self.text[self.pos:]
+        chunk = self.stream.read(max(self.chunkSize, len(rest)))
+        if not chunk:
+            self.eof = True
+        self.text = rest + chunk
+        self.pos = 0
+
+    def nextToken(self):
+        """
+        Match the next token. A token at the end of the buffer might be
+        truncated, so we read more until it is followed by other text.
+        """
+        while True:
+            m = _TOKEN_RE.match(self.text, self.pos)
+            kind = m.lastindex
+            if self.eof or not (kind >= _TOKEN_UNTERMINATED or
+                    (kind == _TOKEN_ATOM and m.end() == len(self.text))):
+                return m
+            self.readMore()
+
+    def expectOpening(self, m):
+        if m.lastindex != _TOKEN_OPEN:
+            c = self.text[m.end(1):m.end(1) + 1]
+            raise ParseError(f"Expected '(', got {repr(c)}")
+
+@contextmanager
+def _gcPaused():
+    """
+    The parser allocates a large number of small objects that never form
+    reference cycles. Triggering the cyclic garbage collector over and over
+    while building the tree only costs time, so we pause it.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def _readSexprFast(text, pos, limit=None, strings=None):
+    """
+    Reads SExpression starting at the opening parenthesis on position pos of
+    text. Returns the expression and the position just after it. The limit has
+    the same meaning as in readSexpr, strings is an optional _StringTable shared
+    by multiple calls.
+    """
+    match = _TOKEN_RE.match
+    if strings is None:
+        strings = _StringTable()
+    intern = strings.intern
+    root = SExpr()
+    stack = [root]
+    current = root
+    pos += 1
+    while True:
+        if limit is not None and limit <= 0 and current is root:
+            if pos >= len(text):
+                raise ParseError("Unexpected end of file within expression")
+            # We've read enough nodes, capture the rest
+            root.trailingWhitespace = text[pos:]
+            root.complete = False
+            return root, len(text)
+        m = match(text, pos)
+        kind = m.lastindex
+        if kind == _TOKEN_EOF:
+            raise ParseError("Unexpected end of file within expression")
+        pos = m.end()
+        if kind == _TOKEN_CLOSE:
+            current.trailingWhitespace = strings[m.group(1)]
+            # Drop the over-allocated capacity of the list
+            current.items = current.items[:]
+            stack.pop()
+            if not stack:
+                return root, pos
+            current = stack[-1]
+            continue
+        if kind == _TOKEN_OPEN:
+            node = SExpr(leadingWhitespace=strings[m.group(1)])
+            current.items.append(node)
+            if limit is not None and current is root:
+                limit -= 1
+            stack.append(node)
+            current = node
+            continue
+        if kind == _TOKEN_UNTERMINATED:
+            raise ParseError("Unexpected end of file in quoted string")
+        current.items.append(Atom(intern(m.group(kind)), strings[m.group(1)],
+                                  kind == _TOKEN_QUOTED))
+        if limit is not None and current is root:
+            limit -= 1
+
+def _expectParenthesis(text, pos):
+    c = text[pos:pos + 1]
+    if c != "(":
+        raise ParseError(f"Expected '(', got {repr(c)}")
+
+def parseSexprFastS(s, limit=None):
+    """
+    Equivalent of parseSexprS that tokenizes the whole string at once. On
+    1-2 MB boards it is about 1.25x faster than the stream-based parser and the
+    shared strings make the tree about 30 % smaller, but it requires the whole
+    input to be in memory.
+    """
+    start = _WHITESPACE_RE.match(s).end()
+    _expectParenthesis(s, start)
+    with _gcPaused():
+        expr, end = _readSexprFast(s, start, limit=limit)
+    expr.leadingWhitespace = s[:start]
+    expr.trailingOuterWhitespace = _WHITESPACE_RE.match(s, end).group()
+    return expr
+
+def parseSexprFastF(sourceStream, limit=None):
+    """
+    Equivalent of parseSexprF that reads the whole stream and parses it via
+    parseSexprFastS.
+    """
+    return parseSexprFastS(sourceStream.read(), limit=limit)
+
+def parseSexprListFastS(s, limit=None):
+    """
+    Equivalent of parseSexprListF that tokenizes the whole string at once.
+    """
+    sexprs = []
+    strings = _StringTable()
+    pos = 0
+    while pos < len(s):
+        start = _WHITESPACE_COMMENTS_RE.match(s, pos).end()
+        # Check if we've reached EOF after reading whitespace
+        if start >= len(s):
+            break
+        _expectParenthesis(s, start)
+        with _gcPaused():
+            expr, end = _readSexprFast(s, start, limit=limit, strings=strings)
+        expr.leadingWhitespace = s[pos:start]
+        pos = _WHITESPACE_COMMENTS_RE.match(s, end).end()
+        expr.trailingOuterWhitespace = s[end:pos]
+        sexprs.append(expr)
+    return sexprs
+
+def parseSexprListFastF(sourceStream, limit=None):
+    """
+    Equivalent of parseSexprListF that reads the whole stream and parses it via
+    parseSexprListFastS.
+    """
+    return parseSexprListFastS(sourceStream.read(), limit=limit)
+
+# The memory-mapped backend runs the very same tokenizer over bytes. Note that
+# on bytes, only ASCII characters are considered to be whitespace.
+_TOKEN_BYTES_RE = re.compile(_TOKEN_RE.pattern.encode("ascii"), re.S)
+_WHITESPACE_BYTES_RE = re.compile(rb"\s*")
+
+_sexprItems = SExpr.__dict__["items"]
+_sexprTrailingWhitespace = SExpr.__dict__["trailingWhitespace"]
+_sexprTrailingOuterWhitespace = SExpr.__dict__["trailingOuterWhitespace"]
+
+class _MappedSource:
+    """
+    Mapped file shared by all nodes of a tree produced by parseSexprMmap. The
+    offsets array holds two entries per token: the offset of the token
+    (including its leading whitespace) in the buffer and, for an opening
+    parenthesis, the index of the token that follows the matching closing one.
+    """
+    __slots__ = ['buffer', 'offsets', 'strings']
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.offsets = array("q")
+        self.strings = _StringTable()
+
+    def tokenize(self, pos):
+        """
+        Record the tokens of the expression starting at the given position and
+        return the position after it.
+        """
+        match = _TOKEN_BYTES_RE.match
+        buffer = self.buffer
+        offsets = self.offsets
+        append = offsets.append
+        stack = []
+        while True:
+            m = match(buffer, pos)
+            kind = m.lastindex
+            if kind == _TOKEN_EOF:
+                raise ParseError("Unexpected end of file within expression")
+            if kind == _TOKEN_UNTERMINATED:
+                raise ParseError("Unexpected end of file in quoted string")
+            append(pos)
+            append(0)
+            pos = m.end()
+            if kind == _TOKEN_OPEN:
+                stack.append(len(offsets) - 1)
+            elif kind == _TOKEN_CLOSE:
+                offsets[stack.pop()] = len(offsets) // 2
+                if not stack:
+                    return pos
+
+class MappedSExpr(SExpr):
+    """
+    SExpr parsed from a memory-mapped file. It keeps only the index of its
+    opening token in the shared source and builds its children on the first
+    access. Untouched expressions are serialized by copying the mapped bytes.
+    """
+    __slots__ = ['_source', '_index']
+
+    def __init__(self, source, index, leadingWhitespace="",
+                 trailingOuterWhitespace=""):
+        self.leadingWhitespace = leadingWhitespace
+        self.complete = True
+        _sexprTrailingOuterWhitespace.__set__(self, trailingOuterWhitespace)
+        self._source = source
+        self._index = index # None when the children are built
+
+    @property
+    def items(self):
+        if self._index is not None:
+            self._build()
+        return _sexprItems.__get__(self, None)
+
+    @items.setter
+    def items(self, value):
+        if self._index is not None:
+            self._build()
+        _sexprItems.__set__(self, value)
+
+    @property
+    def trailingWhitespace(self):
+        if self._index is not None:
+            self._build()
+        return _sexprTrailingWhitespace.__get__(self, None)
+
+    @trailingWhitespace.setter
+    def trailingWhitespace(self, value):
+        if self._index is not None:
+            self._build()
+        _sexprTrailingWhitespace.__set__(self, value)
+
+    def isParsed(self):
+        """
+        Return true if the children of the expression are built
+        """
+        return self._index is None
+
+    def _build(self):
+        source = self._source
+        match = _TOKEN_BYTES_RE.match
+        buffer = source.buffer
+        offsets = source.offsets
+        strings = source.strings
+        items = []
+        i = self._index + 1
+        while True:
+            m = match(buffer, offsets[2 * i])
+            kind = m.lastindex
+            whitespace = strings[m.group(1).decode("utf-8")]
+            if kind == _TOKEN_CLOSE:
+                break
+            if kind == _TOKEN_OPEN:
+                items.append(MappedSExpr(source, i, whitespace))
+                i = offsets[2 * i + 1]
+            else:
+                items.append(Atom(strings.intern(m.group(kind).decode("utf-8")),
+                                  whitespace, kind == _TOKEN_QUOTED))
+                i += 1
+        _sexprItems.__set__(self, items)
+        _sexprTrailingWhitespace.__set__(self, whitespace)
+        self._index = None
+
+    def _parts(self):
+        if self._index is None:
+            return super()._parts()
+        source = self._source
+        offsets = source.offsets
+        start = _TOKEN_BYTES_RE.match(source.buffer, offsets[2 * self._index]).end()
+        closing = offsets[2 * self._index + 1] - 1
+        end = _TOKEN_BYTES_RE.match(source.buffer, offsets[2 * closing]).end()
+        return (self.leadingWhitespace + "("
+                    + source.buffer[start:end].decode("utf-8")
+                    + self.trailingOuterWhitespace,
+                (), "")
+
+def parseSexprMmap(path):
+    """
+    Parse S-Expression from a file by memory-mapping it. Parsing only records
+    the offsets of the tokens in a compact array; the nodes are built from the
+    mapped buffer when they are first accessed (see MappedSExpr). Syntax errors
+    are still reported by the parse itself.
+
+    Unlike the text-mode parsers, no newline translation happens, so the tree
+    serializes to exactly the bytes of the file.
+    """
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            buffer = b""
+    start = _WHITESPACE_BYTES_RE.match(buffer).end()
+    c = buffer[start:start + 1]
+    if c != b"(":
+        raise ParseError(f"Expected '(', got {repr(c.decode('utf-8', 'replace'))}")
+    source = _MappedSource(buffer)
+    end = source.tokenize(start)
+    return MappedSExpr(source, 0, buffer[:start].decode("utf-8"),
+        _WHITESPACE_BYTES_RE.match(buffer, end).group().decode("utf-8"))
+
+# Skipping a subtree only needs to track parentheses, so we let the regex jump
+# over everything else. Quotes and hashes start a string or a comment only when
+# they appear at the start of a token; otherwise they are a part of an atom.
+_SPECIAL_RE = re.compile(r'[^()"#]*([()"#]|\Z)')
+_QUOTED_RE = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+
+def _skipSexpr(text, pos):
+    """
+    Given a position of an opening parenthesis, return the position just after
+    the matching closing parenthesis without building the expression.
+    """
+    match = _SPECIAL_RE.match
+    depth = 0
+    stringEnd = -1
+    while True:
+        m = match(text, pos)
+        c = m.group(1)
+        p = m.start(1)
+        pos = p + 1
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+            if depth == 0:
+                return pos
+        elif not c:
+            raise ParseError("Unexpected end of file within expression")
+        elif p != stringEnd and not (text[p - 1].isspace() or text[p - 1] in "()"):
+            continue # Quote or hash inside an atom
+        elif c == '"':
+            q = _QUOTED_RE.match(text, p)
+            if q is None:
+                raise ParseError("Unexpected end of file in quoted string")
+            pos = stringEnd = q.end()
+        else:
+            newline = text.find("\n", p)
+            pos = len(text) if newline < 0 else newline + 1
+
+class LazySExpr(SExpr):
+    """
+    SExpr backed by the source text that parses its children only when they are
+    accessed. Iteration parses the children one by one, so a search for a node
+    stops parsing as soon as it finds it. Child expressions are again lazy; the
+    parser only records their span by counting parentheses.
+
+    Untouched parts of the tree are serialized by copying the source text.
+    """
+    __slots__ = ['_source', '_start', '_end', '_scanPos', '_strings']
+
+    def __init__(self, source, start, end=None, leadingWhitespace="",
+                 trailingOuterWhitespace=None, strings=None):
+        _sexprItems.__set__(self, [])
+        self.leadingWhitespace = leadingWhitespace
+        self.complete = True
+        if trailingOuterWhitespace is not None:
+            self.trailingOuterWhitespace = trailingOuterWhitespace
+        self._source = source
+        self._start = start
+        self._end = end
+        self._scanPos = start + 1 # None when all children are parsed
+        self._strings = _StringTable() if strings is None else strings
+
+    @property
+    def items(self):
+        self._scanAll()
+        return _sexprItems.__get__(self, None)
+
+    @items.setter
+    def items(self, value):
+        self._scanAll()
+        _sexprItems.__set__(self, value)
+
+    @property
+    def trailingWhitespace(self):
+        self._scanAll()
+        return _sexprTrailingWhitespace.__get__(self, None)
+
+    @trailingWhitespace.setter
+    def trailingWhitespace(self, value):
+        self._scanAll()
+        _sexprTrailingWhitespace.__set__(self, value)
+
+    @property
+    def trailingOuterWhitespace(self):
+        try:
+            return _sexprTrailingOuterWhitespace.__get__(self, None)
+        except AttributeError:
+            value = _WHITESPACE_RE.match(self._source, self._getEnd()).group()
+            _sexprTrailingOuterWhitespace.__set__(self, value)
+            return value
+
+    @trailingOuterWhitespace.setter
+    def trailingOuterWhitespace(self, value):
+        _sexprTrailingOuterWhitespace.__set__(self, value)
+
+    def _getEnd(self):
+        if self._end is None:
+            self._end = _skipSexpr(self._source, self._start)
+        return self._end
+
+    def _scanNext(self):
+        """
+        Parse next child. Returns false if there are no more children.
+        """
+        if self._scanPos is None:
+            return False
+        text = self._source
+        m = _TOKEN_RE.match(text, self._scanPos)
+        kind = m.lastindex
+        strings = self._strings
+        if kind == _TOKEN_CLOSE:
+            _sexprTrailingWhitespace.__set__(self, strings[m.group(1)])
+            self._scanPos = None
+            self._end = m.end()
+            return False
+        if kind == _TOKEN_EOF:
+            raise ParseError("Unexpected end of file within expression")
+        if kind == _TOKEN_UNTERMINATED:
+            raise ParseError("Unexpected end of file in quoted string")
+        items = _sexprItems.__get__(self, None)
+        if kind == _TOKEN_OPEN:
+            start = m.end() - 1
+            end = _skipSexpr(text, start)
+            items.append(LazySExpr(text, start, end, strings[m.group(1)], "",
+                                   strings))
+            self._scanPos = end
+        else:
+            items.append(Atom(strings.intern(m.group(kind)),
+                              strings[m.group(1)], kind == _TOKEN_QUOTED))
+            self._scanPos = m.end()
+        return True
+
+    def _scanAll(self):
+        while self._scanNext():
+            pass
+
+    def isParsed(self):
+        """
+        Return true if all children of the expression are parsed
+        """
+        return self._scanPos is None
+
+    def __iter__(self):
+        i = 0
+        while True:
+            items = _sexprItems.__get__(self, None)
+            if i < len(items):
+                yield items[i]
+                i += 1
+            elif not self._scanNext():
+                return
+
+    def _parts(self):
+        if self._scanPos is None:
+            return super()._parts()
+        if self._end is None:
+            # We haven't found the end of a top-level expression yet. Finding
+            # it requires to scan the whole source, so just copy the rest of the
+            # source (the same way the parsers with limit do).
+            suffix = self._source[self._scanPos:]
+        else:
+            suffix = self._source[self._scanPos:self._end] + self.trailingOuterWhitespace
+        if self._scanPos == self._start + 1:
+            # Untouched expression, copy the source
+            return self.leadingWhitespace + "(" + suffix, (), ""
+        return self.leadingWhitespace + "(", _sexprItems.__get__(self, None), suffix
+
+def emitSexpr(node: "AstNode", emit: Callable[[str], None]) -> None:
+    """
+    Serialize the node piece by piece and pass the pieces to emit. Unmodified
+    parts of lazily parsed trees are emitted as a single slice of the source.
+
+    The nesting is tracked by an explicit stack, so deeply nested expressions
+    do not hit the recursion limit.
+    """
+    stack = []
+    current, suffix = iter([node]), ""
+    while True:
+        for item in current:
+            cls = item.__class__
+            if cls is Atom:
+                # Plain atoms and expressions are by far the most common, so
+                # they are serialized inline
+                if item.quoted:
+                    emit(item.leadingWhitespace + '"' + item.value + '"')
+                else:
+                    emit(item.leadingWhitespace + item.value)
+                continue
+            if cls is SExpr:
+                emit(item.leadingWhitespace + "(")
+                stack.append((current, suffix))
+                current = iter(item.items)
+                suffix = item.trailingWhitespace + (")" if item.complete else "") \
+                         + item.trailingOuterWhitespace
+                break
+            if isinstance(item, SExpr):
+                prefix, children, childSuffix = item._parts()
+                emit(prefix)
+                stack.append((current, suffix))
+                current, suffix = iter(children), childSuffix
+                break
+            emit(str(item))
+        else:
+            emit(suffix)
+            if not stack:
+                return
+            current, suffix = stack.pop()
+
+def dumpSexprF(node: "AstNode", sourceStream) -> None:
+    """
+    Write the serialized node into the stream. The output is written piece by
+    piece, so it is never built in memory as a whole. When the node is a lazily
+    parsed tree, only the modified nodes are serialized, the rest is copied from
+    the original source.
+    """
+    emitSexpr(node, sourceStream.write)
+
+def parseSexprLazyS(s):
+    """
+    Parse S-Expression lazily - the children are parsed only when accessed (see
+    LazySExpr). Note that syntax errors are reported only when the erroneous
+    part is accessed.
+    """
+    start = _WHITESPACE_RE.match(s).end()
+    _expectParenthesis(s, start)
+    return LazySExpr(s, start, leadingWhitespace=s[:start])
+
+def parseSexprLazyF(sourceStream):
+    return parseSexprLazyS(sourceStream.read())
+
 AstNode = Union[SExpr, Atom]
 
 def isElement(name: str) -> Callable[[AstNode], bool]:
@@ -424,14 +1121,13 @@ def readStrDict(nodes: Iterable[AstNode]) -> Dict[str, str]:
 
 def findNode(nodes: Iterable[AstNode], name: str) -> Optional[SExpr]:
     """
-    Finds a node with given name in a list of nodes
+    Finds a node with given name in a list of nodes. On lazily parsed nodes, only
+    the name of each node is parsed, the rest of the subtrees are skipped.
     """
     for node in nodes:
         if isinstance(node, Atom):
             continue
-        if len(node.items) == 0:
-            continue
-        nameNode = node.items[0]
+        nameNode = next(iter(node), None)
         if isinstance(nameNode, Atom) and nameNode.value == name:
             return node
     return None
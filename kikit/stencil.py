@@ -4,7 +4,8 @@ import json
 from collections import OrderedDict
 from kikit.common import *
 from kikit.defs import *
-from kikit.substrate import Substrate, extractRings, toShapely, linestringToKicad
+from kikit.substrate import (Substrate, EdgeGeometry, extractRings, toShapely,
+    linestringToKicad)
 from kikit.export import gerberImpl, pasteDxfExport
 from kikit.export import exportSettingsJlcpcb
 import solid
@@ -424,7 +425,7 @@ def extractComponentPolygons(footprints, srcLayer):
     """
     polygons = []
     for f in footprints:
-       edges = collectFootprintEdges(f, srcLayer)
+       edges = EdgeGeometry(collectFootprintEdges(f, srcLayer))
        for ring in extractRings(edges):
            polygons.append(toShapely(ring, edges))
     return polygons
@@ -3,13 +3,15 @@ from shapely.geometry import (Polygon, MultiPolygon, LineString,
     MultiLineString, LinearRing, Point)
 from shapely.geometry.collection import GeometryCollection
 from shapely.ops import orient, unary_union, split, nearest_points
+from shapely.prepared import prep
 import shapely
 import json
 import numpy as np
 from kikit.intervals import Interval, BoxNeighbors, BoxPartitionLines
 import pcbnew
 from enum import IntEnum
-from itertools import product
+from itertools import chain
+from math import acos, ceil, hypot, isfinite, pi, sqrt
 
 from typing import Iterable, List, Tuple, Union
 
@@ -45,194 +47,257 @@ class TabFilletError(RuntimeError):
 def roundPoint(point, precision=-2):
     return (round(point[0], precision), round(point[1], precision))
 
-def getStartPoint(geom):
-    if geom.GetShape() == STROKE_T.S_CIRCLE:
-        # Circle start is circle center /o\
-        point = geom.GetStart() + pcbnew.VECTOR2I(geom.GetRadius(), 0)
-    elif geom.GetShape() == STROKE_T.S_RECT:
-        point = geom.GetStart()
-    elif geom.GetShape() == STROKE_T.S_POLYGON:
-        # Polygons don't use the properties for start point, look into the
-        # geometry
-        point = geom.GetPolyShape().Outline(0).CPoints()[0]
-    else:
-        point = geom.GetStart()
-    return point
-
-def getEndPoint(geom):
-    if geom.GetShape() == STROKE_T.S_CIRCLE:
-        # Circle start is circle center /o\
-        point = geom.GetStart() + pcbnew.VECTOR2I(geom.GetRadius(), 0)
-    elif geom.GetShape() == STROKE_T.S_RECT:
-        # Rectangle is closed, so it starts at the same point as it ends
-        point = geom.GetStart()
-    elif geom.GetShape() == STROKE_T.S_POLYGON:
-        # Polygons don't use the properties for start point, look into the
-        # geometry
-        outline = geom.GetPolyShape().Outline(0)
-        if outline.IsClosed():
-            point = outline.CPoints()[0]
-        else:
-            point = outline.CPoints()[-1]
-    else:
-        point = geom.GetStart() if geom.IsClosed() else geom.GetEnd()
-    return point
-
-class CoincidenceList(list):
-    def getNeighbor(self, myIdx):
-        if self[0] == myIdx:
-            return self[1]
-        return self[0]
-
-def getUnused(usageList):
-    return usageList.index(True)
-
-def findRing(startIdx, geometryList, coincidencePoints, unused):
+def roundPoints(points, precision=-2):
     """
-    Find a geometry ring starting at given element, returns it as a list of indices
+    Vectorized version of roundPoint for an integer array of points. Rounds
+    half to even just like the built-in round.
     """
-    unused[startIdx] = False
-    ring = [startIdx]
-    if roundPoint(getStartPoint(geometryList[startIdx])) == roundPoint(getEndPoint(geometryList[startIdx])):
-        return ring
-    currentPoint = roundPoint(getEndPoint(geometryList[startIdx]))
-    while True:
-        nextIdx = coincidencePoints[currentPoint].getNeighbor(ring[-1])
-        assert(unused[nextIdx] or nextIdx == startIdx)
-        if currentPoint == roundPoint(getStartPoint(geometryList[nextIdx])):
-            currentPoint = roundPoint(getEndPoint(geometryList[nextIdx]))
-        else:
-            currentPoint = roundPoint(getStartPoint(geometryList[nextIdx]))
-        unused[nextIdx] = False
-        if nextIdx == startIdx:
-            return ring
-        ring.append(nextIdx)
+    unit = 10 ** -precision
+    quotient, remainder = np.divmod(np.asarray(points, dtype=np.int64), unit)
+    half = unit // 2
+    quotient += (remainder > half) | ((remainder == half) & (quotient % 2 == 1))
+    return quotient * unit
 
-def isValidPcbShape(g):
+def findRings(starts, ends):
     """
-    Currently, we are aware of a single case of an invalid pcb_shape -- line
-    with zero length. Unfortunately, KiCAD does not discard such lines when
-    saving. Therefore, we have to check it.
+    Given arrays of rounded start and end points of edges, return a list of
+    continuous rings as lists of edge indices. Each edge is either closed on
+    its own or shares both of its end points with exactly one other edge.
     """
-    return g.GetShape() != pcbnew.S_SEGMENT or g.GetLength() >= fromMm(0.001)
-
-def extractRings(geometryList):
-    """
-    Walks a list of PCB_SHAPE entities and produces a list of continuous rings
-    returned as list of list of indices from the geometryList.
-    """
-    coincidencePoints = {}
-    invalidGeometry = []
-    for i, geom in enumerate(geometryList):
-        if not isValidPcbShape(geom):
-            invalidGeometry.append(i)
-            continue
-        start = roundPoint(getStartPoint(geom))
-        coincidencePoints.setdefault(start, CoincidenceList()).append(i)
-        end = roundPoint(getEndPoint(geom))
-        coincidencePoints.setdefault(end, CoincidenceList()).append(i)
-    for point, items in coincidencePoints.items():
-        l = len(items)
-        if l == 1:
+    edgeCount = len(starts)
+    if edgeCount == 0:
+        return []
+    # Slot 2i is the start of edge i, slot 2i + 1 its end
+    slots = np.empty((2 * edgeCount, 2), dtype=np.int64)
+    slots[0::2] = starts
+    slots[1::2] = ends
+    _, firstSlot, pointIds, counts = np.unique(slots, axis=0, return_index=True,
+        return_inverse=True, return_counts=True)
+    pointIds = pointIds.reshape(-1)
+
+    invalid = np.flatnonzero(counts != 2)
+    if len(invalid) > 0:
+        # Report the point that appears first in the edge list
+        invalidId = invalid[np.argmin(firstSlot[invalid])]
+        point = tuple(int(x) for x in slots[firstSlot[invalidId]])
+        count = counts[invalidId]
+        if count == 1:
             raise PositionError("Discontinuous outline at [{}, {}]. This may have several causes:\n" +
                                 "    - The outline in really discontinuous. Check the coordinates in your source board.\n" +
                                 "    - You haven't included all the outlines or in the case of multi-design,\n" +
                                 "      you have included a part of outline from a neighboring board.",
                                 point)
-        if l == 2:
-            continue
-        raise PositionError("Multiple outlines ({}) at [{{}}, {{}}]".format(l), point)
+        raise PositionError("Multiple outlines ({}) at [{{}}, {{}}]".format(count), point)
+
+    # Pair the two slots sharing each of the points
+    order = np.argsort(pointIds, kind="stable")
+    partner = np.empty(2 * edgeCount, dtype=np.int64)
+    partner[order[0::2]] = order[1::2]
+    partner[order[1::2]] = order[0::2]
+    partner = partner.tolist()
+    closed = (pointIds[0::2] == pointIds[1::2]).tolist()
 
     rings = []
-    unused = [True] * len(geometryList)
-    for invalidIdx in invalidGeometry:
-        unused[invalidIdx] = False
-    while any(unused):
-        start = getUnused(unused)
-        rings.append(findRing(start, geometryList, coincidencePoints, unused))
+    unused = [True] * edgeCount
+    for startIdx in range(edgeCount):
+        if not unused[startIdx]:
+            continue
+        unused[startIdx] = False
+        ring = [startIdx]
+        rings.append(ring)
+        if closed[startIdx]:
+            continue
+        slot = 2 * startIdx + 1
+        while True:
+            entry = partner[slot]
+            nextIdx = entry >> 1
+            if nextIdx == startIdx:
+                break
+            assert unused[nextIdx]
+            unused[nextIdx] = False
+            ring.append(nextIdx)
+            # Leave the edge via the opposite end than we entered
+            slot = entry ^ 1
     return rings
 
-def commonEndPoint(a, b):
-    """
-    Return common end/start point of two entities
-    """
-    aStart, aEnd = getStartPoint(a), getEndPoint(a)
-    bStart, bEnd = getStartPoint(b), getEndPoint(b)
-    if roundPoint(aStart) == roundPoint(bStart) or roundPoint(aStart) == roundPoint(bEnd):
-        return aStart
-    return aEnd
+SEGMENTS_PER_FULL = 4 * 32 # To Be consistent with default shapely settings
+CURVE_POINTS = 4 * 32 - 2
 
-def approximateArc(arc, endWith):
+def approximateArcs(centers, radii, startAngles, endAngles, circles):
     """
-    Take DRAWINGITEM and approximate it using lines
+    Approximate arcs given by arrays of their centers, radii, start and end
+    angles (in degrees) using lines. Full circles start at the start angle.
+    Returns a list of point arrays, one for each arc.
     """
-    SEGMENTS_PER_FULL= 4 * 32 # To Be consistent with default shapely settings
-
-    startAngle = EDA_ANGLE(0, pcbnew.DEGREES_T)
-    endAngle = EDA_ANGLE(0, pcbnew.DEGREES_T)
-    arc.CalcArcAngles(startAngle, endAngle)
-    if arc.GetShape() == STROKE_T.S_CIRCLE:
-        endAngle = startAngle + 360 * deg
-        segments = SEGMENTS_PER_FULL
-    else:
-        segments = abs(int((endAngle.AsDegrees() - startAngle.AsDegrees()) * SEGMENTS_PER_FULL // 360))
+    if len(radii) == 0:
+        return []
+    endAngles = np.where(circles, startAngles + 360, endAngles)
+    segments = np.where(circles, SEGMENTS_PER_FULL,
+        np.abs(((endAngles - startAngles) * SEGMENTS_PER_FULL // 360).astype(np.int64)))
     # Ensure a minimal number of segments for small angle section of arcs
-    segments = max(segments, 12)
-    theta = np.linspace(startAngle.AsRadians(), endAngle.AsRadians(), segments)
-    x = arc.GetCenter()[0] + arc.GetRadius() * np.cos(theta)
-    y = arc.GetCenter()[1] + arc.GetRadius() * np.sin(theta)
-    outline = list(np.column_stack([x, y]))
-
-    end = np.array(endWith)
-    first = np.array([outline[0][0], outline[0][1]])
-    last = np.array([outline[-1][0], outline[-1][1]])
-    if (np.linalg.norm(end - first) < np.linalg.norm(end - last)):
-        outline.reverse()
-    return outline
-
-def approximateBezier(bezier, endWith):
+    segments = np.maximum(segments, 12)
+
+    # Equivalent of np.linspace for each of the arcs at once. The conversion to
+    # radians is the one of EDA_ANGLE.AsRadians, which the per-arc
+    # approximation used; test_approximateArcsMatchesPcbnew compares the two.
+    startTheta = startAngles * np.pi / 180.0
+    endTheta = endAngles * np.pi / 180.0
+    step = (endTheta - startTheta) / (segments - 1)
+    offsets = np.cumsum(segments) - segments
+    owner = np.repeat(np.arange(len(segments)), segments)
+    k = np.arange(owner.size) - offsets[owner]
+    theta = k * step[owner] + startTheta[owner]
+    lasts = offsets + segments - 1
+    theta[lasts] = endTheta
+
+    x = centers[owner, 0] + radii[owner] * np.cos(theta)
+    y = centers[owner, 1] + radii[owner] * np.sin(theta)
+    return np.split(np.column_stack([x, y]), offsets[1:])
+
+def approximateBeziers(starts, controls1, controls2, ends):
     """
-    Take DRAWINGITEM bezier and approximate it using lines.
+    Approximate cubic bezier curves given by arrays of their control points
+    using lines. Returns a list of point arrays, one for each curve.
 
     This is more or less inspired by the KiCAD code as KiCAD does not export
     the relevant functions
     """
-    assert bezier.GetShape() == STROKE_T.S_CURVE
-
-    CURVE_POINTS = 4 * 32 - 2
+    if len(starts) == 0:
+        return []
+    # The Bernstein coefficients are evaluated in plain floats just like the
+    # original point-by-point implementation, so the results are identical
     dt = 1.0 / CURVE_POINTS
+    coefficients = np.array([
+        ((1 - t) ** 3, 3 * t * (1 - t) ** 2, 3 * t ** 2 * (1 - t), t ** 3)
+        for t in (dt * i for i in range(CURVE_POINTS))])
+    a, b, c, d = (coefficients[np.newaxis, :, k, np.newaxis] for k in range(4))
+    s, c1 = starts[:, np.newaxis, :], controls1[:, np.newaxis, :]
+    c2, e = controls2[:, np.newaxis, :], ends[:, np.newaxis, :]
+    vertices = a * s + b * c1 + c * c2 + d * e
+    degenerated = (starts == controls1).all(axis=1) & (controls2 == ends).all(axis=1)
+    curves = []
+    for i in range(len(starts)):
+        if degenerated[i]:
+            inner = np.array([starts[i], ends[i]], dtype=np.float64)
+        else:
+            inner = vertices[i]
+        curves.append(np.concatenate([s[i], inner, e[i]]))
+    return curves
 
-    start = np.array(bezier.GetStart())
-    if hasattr(bezier, "GetBezierC1"):
-      bc1 = np.array(bezier.GetBezierC1())
-      bc2 = np.array(bezier.GetBezierC2())
-    else:
-      bc1 = np.array(bezier.GetBezControl1())
-      bc2 = np.array(bezier.GetBezControl2())
-    end = np.array(bezier.GetEnd())
-
-    degenerated = (start == bc1).all() and (bc2 == end).all()
-
-    outline = [start]
-    if not degenerated:
-        for i in range(CURVE_POINTS):
-            t = dt * i
-            vertex = (1 - t) ** 3 * start + \
-                     3 * t * (1 - t) ** 2 * bc1 + \
-                     3 * t ** 2 * (1 - t) * bc2 + \
-                     t ** 3 * end
-            outline.append(vertex)
-    else:
-        outline += [start, end]
-    outline.append(end)
-
-    endWith = np.array(endWith)
-    first = np.array([outline[0][0], outline[0][1]])
-    last = np.array([outline[-1][0], outline[-1][1]])
-    if (np.linalg.norm(endWith - first) < np.linalg.norm(endWith - last)):
-        outline.reverse()
+class EdgeGeometry:
+    """
+    Structure-of-arrays record of a list of PCB_SHAPE entities. The entities are
+    queried via SWIG only once when the record is built; ring extraction and
+    approximation of curves then work on the arrays.
+    """
+    def __init__(self, geometryList):
+        count = len(geometryList)
+        self.geometryList = geometryList
+        self.shapes = np.zeros(count, dtype=np.int64)
+        self.valid = np.ones(count, dtype=bool)
+        # Start and end point of the edge within an outline
+        self.starts = np.zeros((count, 2), dtype=np.int64)
+        self.ends = np.zeros((count, 2), dtype=np.int64)
+        # Arc and circle parameters, angles are in degrees
+        self.centers = np.zeros((count, 2), dtype=np.int64)
+        self.radii = np.zeros(count, dtype=np.int64)
+        self.arcAngles = np.zeros((count, 2), dtype=np.float64)
+        # Bezier control points
+        self.controls = np.zeros((count, 2, 2), dtype=np.int64)
+        # Rectangles and polygons converted to shapely
+        self.polygons = {}
+
+        for i, geom in enumerate(geometryList):
+            shape = geom.GetShape()
+            self.shapes[i] = shape
+            if shape == STROKE_T.S_SEGMENT:
+                # Currently, we are aware of a single case of an invalid
+                # pcb_shape -- line with zero length. Unfortunately, KiCAD does
+                # not discard such lines when saving. Therefore, we have to
+                # check it.
+                self.valid[i] = geom.GetLength() >= fromMm(0.001)
+                start, end = geom.GetStart(), geom.GetEnd()
+            elif shape == STROKE_T.S_ARC:
+                start, end = geom.GetStart(), geom.GetEnd()
+                self._readArc(i, geom)
+            elif shape == STROKE_T.S_CIRCLE:
+                # Circle start is circle center /o\
+                start = end = geom.GetStart() + pcbnew.VECTOR2I(geom.GetRadius(), 0)
+                self._readArc(i, geom)
+            elif shape == STROKE_T.S_RECT:
+                # Rectangle is closed, so it starts at the same point as it ends
+                start = end = geom.GetStart()
+                self.polygons[i] = rectToShapely(geom)
+            elif shape == STROKE_T.S_POLYGON:
+                # Polygons don't use the properties for start point, look into the
+                # geometry
+                polyShape = geom.GetPolyShape()
+                outline = polyShape.Outline(0)
+                points = outline.CPoints()
+                start = points[0]
+                end = points[0] if outline.IsClosed() else points[-1]
+                self.polygons[i] = shapePolyToShapely(polyShape)
+            else:
+                start = geom.GetStart()
+                end = start if geom.IsClosed() else geom.GetEnd()
+                if shape == STROKE_T.S_CURVE:
+                    if hasattr(geom, "GetBezierC1"):
+                        self.controls[i] = (tuple(geom.GetBezierC1()), tuple(geom.GetBezierC2()))
+                    else:
+                        self.controls[i] = (tuple(geom.GetBezControl1()), tuple(geom.GetBezControl2()))
+            self.starts[i] = tuple(start)
+            self.ends[i] = tuple(end)
+
+        self.roundedStarts = roundPoints(self.starts)
+        self.roundedEnds = roundPoints(self.ends)
+        self._curves = None
+
+    def _readArc(self, i, geom):
+        startAngle = EDA_ANGLE(0, pcbnew.DEGREES_T)
+        endAngle = EDA_ANGLE(0, pcbnew.DEGREES_T)
+        geom.CalcArcAngles(startAngle, endAngle)
+        self.arcAngles[i] = (startAngle.AsDegrees(), endAngle.AsDegrees())
+        self.centers[i] = tuple(geom.GetCenter())
+        self.radii[i] = geom.GetRadius()
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def curves(self):
+        """
+        Return a dictionary index -> point array with line approximations of all
+        arcs, circles and bezier curves. The approximation is computed at once
+        on the first call.
+        """
+        if self._curves is not None:
+            return self._curves
+        arcs = np.flatnonzero((self.shapes == STROKE_T.S_ARC) |
+                              (self.shapes == STROKE_T.S_CIRCLE))
+        beziers = np.flatnonzero(self.shapes == STROKE_T.S_CURVE)
+        approximations = approximateArcs(self.centers[arcs], self.radii[arcs],
+            self.arcAngles[arcs, 0], self.arcAngles[arcs, 1],
+            self.shapes[arcs] == STROKE_T.S_CIRCLE)
+        approximations += approximateBeziers(self.starts[beziers],
+            self.controls[beziers, 0], self.controls[beziers, 1], self.ends[beziers])
+        self._curves = dict(zip(chain(arcs.tolist(), beziers.tolist()), approximations))
+        return self._curves
+
+def asEdgeGeometry(geometry):
+    if isinstance(geometry, EdgeGeometry):
+        return geometry
+    return EdgeGeometry(geometry)
 
-    return outline
+def extractRings(geometryList):
+    """
+    Walks a list of PCB_SHAPE entities (or an EdgeGeometry) and produces a list
+    of continuous rings returned as list of list of indices from the
+    geometryList.
+    """
+    edges = asEdgeGeometry(geometryList)
+    validIndices = np.flatnonzero(edges.valid)
+    rings = findRings(edges.roundedStarts[validIndices], edges.roundedEnds[validIndices])
+    validIndices = validIndices.tolist()
+    return [[validIndices[i] for i in ring] for ring in rings]
 
 def shapeLinechainToList(l: pcbnew.SHAPE_LINE_CHAIN) -> List[Tuple[int, int]]:
     return [(p.x, p.y) for p in l.CPoints()]
@@ -273,46 +338,66 @@ def rectToShapely(rect):
 
 def toShapely(ring, geometryList):
     """
-    Take a list of indices representing a ring from PCB_SHAPE entities and
-    convert them into a shapely polygon. The segments are expected to be
-    continuous. Arcs & others are broken down into lines.
+    Take a list of indices representing a ring from PCB_SHAPE entities (or an
+    EdgeGeometry) and convert them into a shapely polygon. The segments are
+    expected to be continuous. Arcs & others are broken down into lines.
     """
+    edges = asEdgeGeometry(geometryList)
+    indices = np.array(ring)
+    following = np.roll(indices, -1)
+
+    # The common end/start point of each two consecutive entities
+    starts, ends = edges.roundedStarts, edges.roundedEnds
+    useStart = (starts[indices] == starts[following]).all(axis=1) | \
+               (starts[indices] == ends[following]).all(axis=1)
+    commonPoints = np.where(useStart[:, np.newaxis],
+                            edges.starts[indices], edges.ends[indices])
+
     outline = []
-    for idxA, idxB in zip(ring, ring[1:] + ring[:1]):
-        shape = geometryList[idxA].GetShape()
-        if shape in [STROKE_T.S_ARC, STROKE_T.S_CIRCLE]:
-            outline += approximateArc(geometryList[idxA],
-                commonEndPoint(geometryList[idxA], geometryList[idxB]))
-        elif shape in [STROKE_T.S_CURVE]:
-            outline += approximateBezier(geometryList[idxA],
-                commonEndPoint(geometryList[idxA], geometryList[idxB]))
+    for i, (idxA, idxB) in enumerate(zip(ring, following.tolist())):
+        shape = edges.shapes[idxA]
+        if shape in [STROKE_T.S_ARC, STROKE_T.S_CIRCLE, STROKE_T.S_CURVE]:
+            curve = edges.curves()[idxA]
+            endWith = commonPoints[i]
+            if np.linalg.norm(endWith - curve[0]) < np.linalg.norm(endWith - curve[-1]):
+                curve = curve[::-1]
+            outline.append(curve)
         elif shape in [STROKE_T.S_RECT]:
             assert idxA == idxB
-            return rectToShapely(geometryList[idxA])
+            return edges.polygons[idxA]
         elif shape in [STROKE_T.S_POLYGON]:
             # Polygons are always closed, so they should appear as stand-alone
             assert len(ring) in [1, 2]
-            return shapePolyToShapely(geometryList[idxA].GetPolyShape())
+            return edges.polygons[idxA]
         elif shape in [STROKE_T.S_SEGMENT]:
-            outline.append(commonEndPoint(geometryList[idxA], geometryList[idxB]))
+            outline.append(commonPoints[i:i + 1])
         else:
-            raise RuntimeError(f"Unsupported shape {shape} in outline")
-    return Polygon(outline)
+            raise RuntimeError(f"Unsupported shape {STROKE_T(shape)} in outline")
+    return Polygon(np.concatenate(outline))
 
 def buildContainmentGraph(polygons):
     """
     Given a list of polygons returns a dictionary a -> [b] representing a
     relation "a contains b". a and b are indices to the original list.
     """
-    # We use the naive algorithm - test all pairs - as the number of polygons is
-    # rather small in a typical scenario
+    # Boards with many cutouts have hundreds of polygons, so we let a spatial
+    # index pick the candidate pairs by their bounding boxes. The containment
+    # tests themselves are then performed on prepared geometries.
     polygonCount = len(polygons)
     relation = {key: [] for key in range(polygonCount)}
-    for a, b in product(range(polygonCount), range(polygonCount)):
-        if a == b:
-            continue
-        if polygons[a].contains(polygons[b]):
-            relation[a].append(b)
+    if polygonCount == 0:
+        return relation
+    geometries = np.array(polygons, dtype=object)
+    containers, contained = shapely.STRtree(geometries).query(geometries)
+    # Testing a polygon against itself is expensive, skip it
+    distinct = containers != contained
+    containers, contained = containers[distinct], contained[distinct]
+    shapely.prepare(geometries)
+    holds = shapely.contains(geometries[containers], geometries[contained])
+    containers, contained = containers[holds], contained[holds]
+    order = np.lexsort((contained, containers))
+    for a, b in zip(containers[order].tolist(), contained[order].tolist()):
+        relation[a].append(b)
     return relation
 
 class DFS(IntEnum):
@@ -379,9 +464,13 @@ class CircleFitCandidates:
         self.radius_limit = radius_limit
 
         self._xs = []
-        self._xSum: float = 0
         self._ys = []
-        self._ySum: float = 0
+        # Running sums of u, v, u^2, uv, v^2, u^3, u^2v, uv^2, v^3, u^4, u^2v^2
+        # and v^4, where u and v are the point coordinates relative to the
+        # first point. Neither adding a point nor the circle fit then has to
+        # revisit all the points.
+        self._sums = (0.0,) * 12
+        self._previousSums = self._sums
 
         self.foundCircle: Optional[Tuple[np.array, float]] = None
 
@@ -395,10 +484,14 @@ class CircleFitCandidates:
         circle, it is not added to the collection.
         """
         self._xs.append(point[0])
-        self._xSum += point[0]
-
         self._ys.append(point[1])
-        self._ySum += point[1]
+        u = float(point[0] - self._xs[0])
+        v = float(point[1] - self._ys[0])
+        self._previousSums = self._sums
+        uu, uv, vv = u * u, u * v, v * v
+        increments = (u, v, uu, uv, vv, uu * u, uu * v, u * vv, vv * v,
+                      uu * uu, uu * vv, vv * vv)
+        self._sums = tuple(s + d for s, d in zip(self._sums, increments))
 
         if len(self) < 5:
             return True
@@ -410,46 +503,67 @@ class CircleFitCandidates:
             needsRevalidation = True
         else:
             c, r = self.foundCircle
-            needsRevalidation = np.linalg.norm(newCenter - c) > self.tolerance or np.abs(newRadius - r) > self.tolerance
+            needsRevalidation = hypot(*(newCenter - c)) > self.tolerance or abs(newRadius - r) > self.tolerance
 
         if needsRevalidation:
-            points = [np.array([x, y]) for x, y in zip(self._xs, self._ys)]
-            toRevalidate = list(zip(points, points[1:]))
+            points = np.column_stack((self._xs, self._ys)).astype(np.float64)
+            fits = self._doLinesFitCircle(points[:-1], points[1:], newCenter, newRadius)
         else:
-            toRevalidate = [(np.array([self._xs[-2], self._ys[-2]]), np.array([self._xs[-1], self._ys[-1]]))]
+            fits = self._doesLineFitCircle(self._xs[-2], self._ys[-2],
+                self._xs[-1], self._ys[-1], newCenter, newRadius)
 
-        if self._doLinesFitCircle(toRevalidate, newCenter, newRadius) and newRadius < self.radius_limit:
+        if fits and newRadius < self.radius_limit:
             self.foundCircle = newCenter, newRadius
             return True
 
         self._popLast()
         return False
 
-    def _doLinesFitCircle(self, lines: Iterable[Tuple[np.array, np.array]],
+    def _doLinesFitCircle(self, starts: np.array, ends: np.array,
                           c: np.array, r: float) -> bool:
-        for start, end in lines:
-            # We don't use list of candidates in this as it is in the hot path
-            # and constructing the list of candidates adds a significant
-            # overhead (both technically, and for early return)
-            #
-            # The extreme occurs either in one of the endpoints or in the
-            # projection of center of the circle to the line (if it lies on the
-            # segment).
-            if np.abs(np.linalg.norm(start - c) - r) > self.tolerance:
-                return False
-            if np.abs(np.linalg.norm(end - c) - r) > self.tolerance:
-                return False
-
-            # Project center to the line; if it doesn't fit line, continue
-            ap = c - start
-            ab = end - start
-            t = np.dot(ap, ab) / np.dot(ab, ab)
-            if t < 0 or t > 1:
-                continue
-            projection = start + t * ab
-            if np.abs(np.linalg.norm(projection - c) - r) > self.tolerance:
-                return False
-        return True
+        """
+        Decide whether all the segments given by their start and end points
+        lie on the circle within tolerance.
+        """
+        # The extreme occurs either in one of the endpoints or in the
+        # projection of center of the circle to the line (if it lies on the
+        # segment).
+        ap = c - starts
+        if (np.abs(np.hypot(ap[:, 0], ap[:, 1]) - r) > self.tolerance).any():
+            return False
+        ec = ends - c
+        if (np.abs(np.hypot(ec[:, 0], ec[:, 1]) - r) > self.tolerance).any():
+            return False
+
+        # Project center to the lines, skip those it doesn't fit
+        ab = ends - starts
+        lengths = (ab * ab).sum(axis=1)
+        valid = lengths > 0
+        t = (ap[valid] * ab[valid]).sum(axis=1) / lengths[valid]
+        onSegment = (t >= 0) & (t <= 1)
+        projections = starts[valid][onSegment] + t[onSegment, None] * ab[valid][onSegment] - c
+        return not (np.abs(np.hypot(projections[:, 0], projections[:, 1]) - r) > self.tolerance).any()
+
+    def _doesLineFitCircle(self, sx: float, sy: float, ex: float, ey: float,
+                           c: np.array, r: float) -> bool:
+        """
+        Single segment variant of _doLinesFitCircle; it is in the hot path, so
+        it avoids NumPy overhead.
+        """
+        cx, cy = float(c[0]), float(c[1])
+        if abs(hypot(sx - cx, sy - cy) - r) > self.tolerance:
+            return False
+        if abs(hypot(ex - cx, ey - cy) - r) > self.tolerance:
+            return False
+        apx, apy = cx - sx, cy - sy
+        abx, aby = ex - sx, ey - sy
+        length = abx * abx + aby * aby
+        if length == 0:
+            return True
+        t = (apx * abx + apy * aby) / length
+        if t < 0 or t > 1:
+            return True
+        return abs(hypot(sx + t * abx - cx, sy + t * aby - cy) - r) <= self.tolerance
 
     @property
     def start(self) -> np.array:
@@ -465,10 +579,9 @@ class CircleFitCandidates:
         return np.array((self._xs[idx], self._ys[idx]))
 
     def _popLast(self):
-        self._xSum -= self._xs[-1]
         self._xs.pop()
-        self._ySum -= self._ys[-1]
         self._ys.pop()
+        self._sums = self._previousSums
 
     def _fitCircle(self, maxIter = 10) -> Tuple[np.array, float]:
         """
@@ -477,24 +590,32 @@ class CircleFitCandidates:
 
         Implementation is based on https://github.com/AlliedToasters/circle-fit/blob/master/src/circle_fit/circle_fit.py
 
+        The moments are computed from the running sums, so the fit takes
+        constant time regardless of the number of points.
+
         Returns center and radius of the circle fit.
         """
         n = len(self._xs)
 
-        xMean = self._xSum / n
-        yMean = self._ySum / n
-
-        Xi = np.array(self._xs) - xMean
-        Yi = np.array(self._ys) - yMean
-        Zi = Xi * Xi + Yi * Yi
-
-        # compute moments
-        Mxy = (Xi * Yi).sum() / n
-        Mxx = (Xi * Xi).sum() / n
-        Myy = (Yi * Yi).sum() / n
-        Mxz = (Xi * Zi).sum() / n
-        Myz = (Yi * Zi).sum() / n
-        Mzz = (Zi * Zi).sum() / n
+        (a, b, Euu, Euv, Evv, Eu3, Eu2v, Euv2, Ev3, Eu4, Eu2v2, Ev4) = \
+            (s / n for s in self._sums)
+
+        # compute moments (central moments via binomial expansion of the raw
+        # ones; a and b are the means)
+        Mxy = Euv - a * b
+        Mxx = Euu - a * a
+        Myy = Evv - b * b
+        Mx3 = Eu3 - 3 * a * Euu + 2 * a ** 3
+        My3 = Ev3 - 3 * b * Evv + 2 * b ** 3
+        Mx2y = Eu2v - b * Euu - 2 * a * Euv + 2 * a * a * b
+        Mxy2 = Euv2 - a * Evv - 2 * b * Euv + 2 * a * b * b
+        Mx4 = Eu4 - 4 * a * Eu3 + 6 * a * a * Euu - 3 * a ** 4
+        My4 = Ev4 - 4 * b * Ev3 + 6 * b * b * Evv - 3 * b ** 4
+        Mx2y2 = Eu2v2 - 2 * b * Eu2v - 2 * a * Euv2 + b * b * Euu + a * a * Evv \
+                + 4 * a * b * Euv - 3 * a * a * b * b
+        Mxz = Mx3 + Mxy2
+        Myz = Mx2y + My3
+        Mzz = Mx4 + 2 * Mx2y2 + My4
 
         # computing the coefficients of characteristic polynomial
         Mz = Mxx + Myy
@@ -512,7 +633,7 @@ class CircleFitCandidates:
         for i in range(maxIter):
             Dy = A1 + X * (A22 + 16. * (X ** 2))
             xnew = X - Y / Dy
-            if xnew == X or not np.isfinite(xnew):
+            if xnew == X or not isfinite(xnew):
                 break
             ynew = A0 + xnew * (A1 + xnew * (A2 + 4. * xnew * xnew))
             if abs(ynew) >= abs(Y):
@@ -523,13 +644,23 @@ class CircleFitCandidates:
         Xcenter = (Mxz * (Myy - X) - Myz * Mxy) / det / 2.
         Ycenter = (Myz * (Mxx - X) - Mxz * Mxy) / det / 2.
 
-        xc: float = Xcenter + xMean
-        yc: float = Ycenter + yMean
-        r = np.sqrt(abs(Xcenter ** 2 + Ycenter ** 2 + Mz))
+        xc: float = Xcenter + a + self._xs[0]
+        yc: float = Ycenter + b + self._ys[0]
+        r = sqrt(abs(Xcenter ** 2 + Ycenter ** 2 + Mz))
         return np.array((xc, yc)), r
 
 
 
+def arcResolution(radius, tolerance=fromMm(0.001), minimum=8, maximum=64):
+    """
+    Return the number of segments per quarter circle for buffering with given
+    radius so the chords deviate from the true arc by at most tolerance.
+    """
+    if radius <= tolerance:
+        return minimum
+    step = 2 * acos(1 - tolerance / radius)
+    return max(minimum, min(maximum, ceil(pi / 2 / step)))
+
 def liesOnSegment(start, end, point, tolerance=fromMm(0.01)):
     """
     Decide if a point lies on a given segment within tolerance
@@ -607,17 +738,21 @@ def closestIntersectionPoint(origin, direction, outline, maxDistance):
             raise TypeError(f"intersection() returned an unsupported datatype: {geom.__class__.__name__}")
     return min([(g, origin.distance(g)) for g in geoms], key=lambda t: t[1])[0]
 
-def closestRing(geom, origin, direction, maxDistance):
+def closestRing(geom, origin, direction, maxDistance, rings=None):
     """
     Given a polygon geometry, find the ring (exterior or one of the
     interiors) that has the closest intersection point from origin in the
     given direction. This allows tab() to work with polygons that have
     holes (e.g., frame geometry with milled slots).
+
+    If rings are given, only these rings of the geometry are considered.
     """
     bestRing = None
     bestDist = float('inf')
     originPoint = Point(origin[0], origin[1])
-    for ring in [geom.exterior] + list(geom.interiors):
+    if rings is None:
+        rings = [geom.exterior] + list(geom.interiors)
+    for ring in rings:
         try:
             p = closestIntersectionPoint(origin, direction, ring, maxDistance)
             d = originPoint.distance(p)
@@ -630,6 +765,50 @@ def closestRing(geom, origin, direction, maxDistance):
         raise NoIntersectionError("No intersection found within given distance", origin)
     return bestRing
 
+class RingIndex:
+    """
+    Spatial index of all rings (exteriors and interiors) of a geometry.
+    """
+    def __init__(self, geometry):
+        self.geoms = list(listGeometries(geometry))
+        self.rings = []
+        owners = []
+        for i, geom in enumerate(self.geoms):
+            if not hasattr(geom, "exterior"):
+                continue
+            for ring in chain([geom.exterior], geom.interiors):
+                self.rings.append(ring)
+                owners.append(i)
+        self.owners = np.array(owners, dtype=np.int64)
+        self.tree = shapely.STRtree(self.rings)
+        self.geomTree = shapely.STRtree(self.geoms)
+
+    def candidates(self, ray):
+        """
+        Return a list of (geometry, rings) of the geometries whose rings
+        intersect the ray. Both follow the order of the indexed geometry.
+        """
+        hits = np.sort(self.tree.query(ray, predicate="intersects"))
+        result = []
+        for ringIdx in hits:
+            geomIdx = self.owners[ringIdx]
+            if not result or result[-1][0] is not self.geoms[geomIdx]:
+                result.append((self.geoms[geomIdx], []))
+            result[-1][1].append(self.rings[ringIdx])
+        return result
+
+    def clip(self, window):
+        """
+        Return the part of the indexed geometry inside the window polygon and
+        the part of its boundary inside the window. Only the geometries and
+        rings near the window are processed.
+        """
+        geomHits = np.sort(self.geomTree.query(window, predicate="intersects"))
+        ringHits = np.sort(self.tree.query(window, predicate="intersects"))
+        geometry = unary_union([self.geoms[i].intersection(window) for i in geomHits])
+        boundary = MultiLineString([self.rings[i] for i in ringHits]).intersection(window)
+        return geometry, boundary
+
 def linestringToKicad(linestring):
     """
     Convert Shapely linestring to KiCAD's linechain
@@ -640,13 +819,53 @@ def linestringToKicad(linestring):
         lineChain.Append(int(c[0]), int(c[1]))
     return lineChain
 
+def buildEdgeShapes(records, width=None):
+    """
+    Build PCB_SHAPEs on the Edge.Cuts layer from edge records in a single
+    pass. The records are tuples starting with the shape type:
+    - (S_SEGMENT, x1, y1, x2, y2),
+    - (S_ARC, startX, startY, midX, midY, endX, endY),
+    - (S_CIRCLE, centerX, centerY, radius).
+    If width is specified, the shapes get it.
+    """
+    shapes = []
+    edgeCuts = Layer.Edge_Cuts
+    for record in records:
+        shape = pcbnew.PCB_SHAPE()
+        shape.SetShape(record[0])
+        shape.SetLayer(edgeCuts)
+        if record[0] == STROKE_T.S_SEGMENT:
+            shape.SetStart(VECTOR2I(record[1], record[2]))
+            shape.SetEnd(VECTOR2I(record[3], record[4]))
+        elif record[0] == STROKE_T.S_ARC:
+            shape.SetArcGeometry(VECTOR2I(record[1], record[2]),
+                                 VECTOR2I(record[3], record[4]),
+                                 VECTOR2I(record[5], record[6]))
+        else:
+            shape.SetCenter(VECTOR2I(record[1], record[2]))
+            shape.SetRadius(record[3])
+        if width is not None:
+            shape.SetWidth(width)
+        shapes.append(shape)
+    return shapes
+
 class Substrate:
     """
     Represents (possibly multiple) PCB substrates reconstructed from a list of
     geometry
     """
-    def __init__(self, geometryList, bufferDistance=0, revertTransformation=None):
-        polygons = [toShapely(ring, geometryList) for ring in extractRings(geometryList)]
+    def __init__(self, geometryList, bufferDistance=0, revertTransformation=None,
+                 deferUnion=False):
+        edges = EdgeGeometry(geometryList)
+        polygons = [toShapely(ring, edges) for ring in extractRings(edges)]
+        # With deferUnion, the pieces passed to union are only queued and they
+        # are merged in a single unary_union once the geometry is read
+        self.deferUnion = deferUnion
+        self._pendingUnion = []
+        self._derived = {}
+        # Translation not yet applied to the geometry and the partition line,
+        # see translate()
+        self._offset = None
         self.substrates = unary_union(substratesFrom(polygons))
         self.oriented = False
         if not self.substrates.is_empty:
@@ -654,11 +873,97 @@ class Substrate:
         self.partitionLine = shapely.geometry.GeometryCollection()
         self.annotations = []
         self.revertTransformation = revertTransformation
+        # Translation accumulated by translate(), it is undone before applying
+        # revertTransformation
+        self.revertOffset = (0, 0)
+
+    def _applyOffset(self):
+        if self._offset is None:
+            return
+        dx, dy = self._offset
+        self._offset = None
+        self._substrates = shapely.affinity.translate(self._substrates, dx, dy)
+        self._pendingUnion = [shapely.affinity.translate(p, dx, dy)
+                              for p in self._pendingUnion]
+        self._partitionLine = shapely.affinity.translate(self._partitionLine, dx, dy)
+
+    @property
+    def substrates(self):
+        self._applyOffset()
+        if self._pendingUnion:
+            self._substrates = unary_union([self._substrates] + self._pendingUnion)
+            self._pendingUnion = []
+            self._derived = {}
+        return self._substrates
+
+    @substrates.setter
+    def substrates(self, geometry):
+        self._applyOffset()
+        self._pendingUnion = []
+        self._substrates = geometry
+        self._derived = {}
+
+    @property
+    def partitionLine(self):
+        self._applyOffset()
+        return self._partitionLine
+
+    @partitionLine.setter
+    def partitionLine(self, geometry):
+        self._applyOffset()
+        self._partitionLine = geometry
+
+    def _cached(self, key, factory):
+        """
+        Return a value derived from the geometry. The values are dropped
+        whenever the geometry changes (e.g., on union, cut or translate).
+        """
+        self.substrates # Merges the pending pieces, which drops stale values
+        try:
+            return self._derived[key]
+        except KeyError:
+            value = factory()
+            self._derived[key] = value
+            return value
+
+    def ringIndex(self):
+        """
+        Return a spatial index of the substrate rings. It is rebuilt lazily
+        whenever the geometry changes.
+        """
+        return self._cached("ringIndex", lambda: RingIndex(self.substrates))
+
+    def prepared(self, bufferDistance=0):
+        """
+        Return the substrate (optionally buffered by bufferDistance) prepared
+        for repeated predicate tests
+        """
+        def factory():
+            geometry = self.substrates
+            if bufferDistance != 0:
+                geometry = geometry.buffer(bufferDistance)
+            return prep(geometry)
+        return self._cached(("prepared", bufferDistance), factory)
+
+    def preparedExterior(self):
+        """
+        Return the exterior (see exterior()) prepared for repeated predicate
+        tests
+        """
+        return self._cached("preparedExterior", lambda: prep(self.exterior()))
+
+    def preparedBoundary(self):
+        """
+        Return the boundary prepared for repeated predicate tests
+        """
+        return self._cached("preparedBoundary", lambda: prep(self.substrates.boundary))
 
     def backToSource(self, point):
         """
         Return a point in the source form (if a reverse transformation was set)
         """
+        if self.revertOffset != (0, 0):
+            point = (point[0] - self.revertOffset[0], point[1] - self.revertOffset[1])
         if self.revertTransformation is not None:
             return self.revertTransformation(point)
         return point
@@ -699,11 +1004,16 @@ class Substrate:
         substrate.
         """
         if isinstance(other, list):
-            self.substrates = unary_union([self.substrates] + other)
+            pieces = other
         elif isinstance(other, Substrate):
-            self.substrates = unary_union([self.substrates, other.substrates])
+            pieces = [other.substrates]
         else:
-            self.substrates = unary_union([self.substrates, other])
+            pieces = [other]
+        if self.deferUnion:
+            self._applyOffset()
+            self._pendingUnion.extend(pieces)
+        else:
+            self.substrates = unary_union([self.substrates] + pieces)
         self.oriented = False
 
     def cut(self, piece):
@@ -712,9 +1022,17 @@ class Substrate:
         """
         self.substrates = self.substrates.difference(piece)
 
-    def serialize(self, reconstructArcs=False):
+    def serialize(self, reconstructArcs=False, width=None):
+        """
+        Produces a list of PCB_SHAPE on the Edge.Cuts layer. If width is
+        specified, the shapes get it.
+        """
+        return buildEdgeShapes(self.serializeRecords(reconstructArcs), width)
+
+    def serializeRecords(self, reconstructArcs=False):
         """
-        Produces a list of PCB_SHAPE on the Edge.Cuts layer
+        Produces a list of edge records describing the substrate outline (see
+        buildEdgeShapes)
         """
         if isinstance(self.substrates, MultiPolygon) or isinstance(self.substrates, GeometryCollection):
             geoms = self.substrates.geoms
@@ -744,6 +1062,13 @@ class Substrate:
         rearranged = np.roll(coords, -max_dist_index, axis=0)
         coords = np.vstack((rearranged, rearranged[0]))
 
+        if not reconstructArcs:
+            # There is nothing to reconstruct; emit all segments at once
+            keep = np.linalg.norm(np.diff(coords, axis=0), axis=1) > SHP_EPSILON
+            points = coords.astype(np.int64)
+            return [(STROKE_T.S_SEGMENT, *a, *b) for a, b in
+                    zip(points[:-1][keep].tolist(), points[1:][keep].tolist())]
+
         segments = []
         i = 0
         while i < len(coords):
@@ -764,7 +1089,7 @@ class Substrate:
                 dir = end - start
                 chordLength = np.linalg.norm(dir)
                 if chordLength == 0:
-                    segments.append(self._constructCircle(center, radius))
+                    segments.append((STROKE_T.S_CIRCLE, int(center[0]), int(center[1]), int(radius)))
                 else:
                     dir /= chordLength
                     normal = np.array([dir[1], -dir[0]])
@@ -790,7 +1115,9 @@ class Substrate:
                     middleCandidates = [center + centerToMidpoint * radius, center - centerToMidpoint * radius]
                     arcMiddle = min(middleCandidates, key=lambda c: np.linalg.norm(c - mid))
 
-                    segments.append(self._constructArc(toKiCADPoint(start), toKiCADPoint(arcMiddle), toKiCADPoint(end)))
+                    segments.append((STROKE_T.S_ARC, int(start[0]), int(start[1]),
+                                     int(arcMiddle[0]), int(arcMiddle[1]),
+                                     int(end[0]), int(end[1])))
 
                 i += len(candidateCircle) - 1
             else:
@@ -798,36 +1125,11 @@ class Substrate:
                 a = coords[i]
                 b = coords[(i + 1) % len(coords)]
                 if np.linalg.norm(np.array(a) - np.array(b)) > SHP_EPSILON:
-                    segments.append(self._constructEdgeSegment(a, b))
+                    segments.append((STROKE_T.S_SEGMENT, int(a[0]), int(a[1]),
+                                     int(b[0]), int(b[1])))
                 i += 1
         return segments
 
-    def _constructEdgeSegment(self, a, b):
-        segment = pcbnew.PCB_SHAPE()
-        segment.SetShape(STROKE_T.S_SEGMENT)
-        segment.SetLayer(Layer.Edge_Cuts)
-        segment.SetStart(toKiCADPoint(a))
-        segment.SetEnd(toKiCADPoint(b))
-        return segment
-
-    def _constructArc(self, a, b, c):
-        """
-        Construct arc based on three points
-        """
-        arc = pcbnew.PCB_SHAPE()
-        arc.SetShape(STROKE_T.S_ARC)
-        arc.SetLayer(Layer.Edge_Cuts)
-        arc.SetArcGeometry(toKiCADPoint(a), toKiCADPoint(b), toKiCADPoint(c))
-        return arc
-
-    def _constructCircle(self, c, r):
-        circle = pcbnew.PCB_SHAPE()
-        circle.SetShape(STROKE_T.S_CIRCLE)
-        circle.SetLayer(Layer.Edge_Cuts)
-        circle.SetCenter(toKiCADPoint(c))
-        circle.SetRadius(int(r))
-        return circle
-
     def boundingBox(self):
         """
         Return bounding box as BOX2I
@@ -841,6 +1143,9 @@ class Substrate:
         """
         Return a geometry representing the substrate with no holes
         """
+        return self._cached("exterior", self._buildExterior)
+
+    def _buildExterior(self):
         if isinstance(self.substrates, MultiPolygon):
             geoms = self.substrates.geoms
         elif isinstance(self.substrates, Polygon):
@@ -880,17 +1185,111 @@ class Substrate:
         """
         self.orient()
 
-        if self.substrates.contains(Point(origin)) and not self.substrates.boundary.contains(Point(origin)):
+        if self.prepared().contains(Point(origin)) and not self.preparedBoundary().contains(Point(origin)):
             raise TabError(origin, direction, ["Tab annotation is placed inside the board. It has to be on edge or outside the board."])
 
+        origin, direction, sideOriginA, sideOriginB = \
+            self._tabOrigins(origin, direction, width)
+        # Only the rings hit by the ray from sideOriginA can yield the tab
+        ray = LineString([sideOriginA, sideOriginA + direction * maxHeight])
+        def boundaries():
+            for geom, rings in self.ringIndex().candidates(ray):
+                try:
+                    yield closestRing(geom, sideOriginA, direction, maxHeight, rings)
+                except NoIntersectionError:
+                    continue
+        return self._tabFromBoundaries(boundaries(), origin, direction,
+            sideOriginA, sideOriginB, partitionLine, maxHeight, fillet)
+
+    def tabs(self, annotations, partitionLine=None, fillet=0):
+        """
+        Create tabs for all the tab annotations (see tab()). The rays of all
+        the tabs are cast against the substrate at once.
+
+        Returns a list with an item for each annotation - either the tab and
+        cut pair as returned by tab() or a TabError.
+        """
+        self.orient()
+        annotations = list(annotations)
+        if len(annotations) == 0:
+            return []
+
+        origins = shapely.points([(a.origin[0], a.origin[1]) for a in annotations])
+        inside = shapely.contains(self.prepared().context, origins)
+        if inside.any():
+            inside[inside] = ~shapely.contains(self.preparedBoundary().context,
+                                               origins[inside])
+
+        rays = []
+        tabOrigins = []
+        for annotation in annotations:
+            origin, direction, sideOriginA, sideOriginB = \
+                self._tabOrigins(annotation.origin, annotation.direction, annotation.width)
+            tabOrigins.append((origin, direction, sideOriginA, sideOriginB))
+            rays.append([sideOriginA, sideOriginA + direction * annotation.maxLength])
+        rays = shapely.linestrings(rays)
+
+        # Find the distance to the closest intersection with every hit ring.
+        # The rays start outside the substrate, so the distance to the
+        # intersection is the distance of its closest point.
+        index = self.ringIndex()
+        rayIdxs, ringIdxs = index.tree.query(rays, predicate="intersects")
+        order = np.lexsort((ringIdxs, rayIdxs))
+        rayIdxs, ringIdxs = rayIdxs[order], ringIdxs[order]
+        rings = np.array(index.rings, dtype=object)
+        intersections = shapely.intersection(rays[rayIdxs], rings[ringIdxs])
+        # Build the points from a (N, 2) array, so no hit at all is fine
+        rayOrigins = np.array([tabOrigins[i][2] for i in rayIdxs],
+                              dtype=np.float64).reshape(-1, 2)
+        distances = shapely.distance(shapely.points(rayOrigins), intersections)
+        hitStarts = np.searchsorted(rayIdxs, np.arange(len(annotations) + 1))
+
+        def closestRings(hits):
+            # The closest ring for each hit geometry in the substrate order
+            bestRing, bestDist = None, None
+            for ringIdx, dist in hits:
+                if bestRing is not None and index.owners[ringIdx] != index.owners[bestRing]:
+                    yield index.rings[bestRing]
+                    bestRing = None
+                if bestRing is None or dist < bestDist:
+                    bestRing, bestDist = ringIdx, dist
+            if bestRing is not None:
+                yield index.rings[bestRing]
+
+        results = []
+        for i, annotation in enumerate(annotations):
+            origin, direction, sideOriginA, sideOriginB = tabOrigins[i]
+            if inside[i]:
+                results.append(TabError(annotation.origin, annotation.direction,
+                    ["Tab annotation is placed inside the board. It has to be on edge or outside the board."]))
+                continue
+            hits = zip(ringIdxs[hitStarts[i]:hitStarts[i + 1]],
+                       distances[hitStarts[i]:hitStarts[i + 1]])
+            try:
+                results.append(self._tabFromBoundaries(closestRings(hits),
+                    origin, direction, sideOriginA, sideOriginB, partitionLine,
+                    annotation.maxLength, fillet))
+            except TabError as e:
+                results.append(e)
+        return results
+
+    @staticmethod
+    def _tabOrigins(origin, direction, width):
         origin = np.array(origin, dtype=np.float64)
         direction = np.around(normalize(direction), 4)
         origin -= direction * float(SHP_EPSILON)
-        for geom in listGeometries(self.substrates):
+        sideOriginA = origin + makePerpendicular(direction) * width / 2
+        sideOriginB = origin - makePerpendicular(direction) * width / 2
+        return origin, direction, sideOriginA, sideOriginB
+
+    def _tabFromBoundaries(self, boundaries, origin, direction, sideOriginA,
+                           sideOriginB, partitionLine, maxHeight, fillet):
+        """
+        Build a tab towards the first of the candidate boundaries (rings) that
+        the tab can be built towards.
+        """
+        for boundary in boundaries:
             try:
-                sideOriginA = origin + makePerpendicular(direction) * width / 2
-                sideOriginB = origin - makePerpendicular(direction) * width / 2
-                boundary = closestRing(geom, sideOriginA, direction, maxHeight)
                 splitPointA = closestIntersectionPoint(sideOriginA, direction,
                     boundary, maxHeight)
                 splitPointB = closestIntersectionPoint(sideOriginB, direction,
@@ -948,10 +1347,18 @@ class Substrate:
             -> Tuple[Polygon, LineString]:
         if fillet == 0:
             return tab, tabFace
-        joined = self.substrates.union(tab)
-        RESOLUTION = 64
-        rounded = joined.buffer(fillet, resolution=RESOLUTION).buffer(-fillet, resolution=RESOLUTION)
-        remainder = rounded.difference(self.substrates,)
+        # The closing (buffer out and in) of a point depends only on the
+        # geometry within 2 * fillet from it, so we can work only with a window
+        # around the tab instead of the whole substrate. The clipping introduces
+        # only convex corners, which the closing leaves untouched.
+        minx, miny, maxx, maxy = tab.bounds
+        margin = 4 * fillet
+        window = shapely.box(minx - margin, miny - margin, maxx + margin, maxy + margin)
+        local, localBoundary = self.ringIndex().clip(window)
+        joined = local.union(tab)
+        resolution = arcResolution(fillet)
+        rounded = joined.buffer(fillet, resolution=resolution).buffer(-fillet, resolution=resolution)
+        remainder = rounded.difference(local)
 
         if isinstance(remainder, MultiPolygon) or isinstance(remainder, GeometryCollection):
             geoms = remainder.geoms
@@ -966,7 +1373,7 @@ class Substrate:
         # to ensure there is an intersection
         candidate = candidates[0].buffer(SHP_EPSILON)
 
-        newFace = candidate.intersection(self.substrates.boundary)
+        newFace = candidate.intersection(localBoundary)
         if isinstance(newFace, GeometryCollection):
             newFace = MultiLineString([x for x in newFace.geoms if not isinstance(x, Polygon)])
         if isinstance(newFace, MultiLineString):
@@ -979,8 +1386,8 @@ class Substrate:
 
     def _strPosition(self, point):
         msg = f"[{toMm(point[0])}, {toMm(point[1])}]"
-        if self.revertTransformation:
-            rp = self.revertTransformation(point)
+        if self.revertTransformation or self.revertOffset != (0, 0):
+            rp = self.backToSource(point)
             msg += f"([{toMm(rp[0])}, {toMm(rp[1])}] in source board)"
         return msg
 
@@ -990,13 +1397,13 @@ class Substrate:
         given radius.
         """
         EPS = 1000 # This number is intentionally near KiCAD's resolution of 1nm to not enclose narrow slots, but to preserve radius
-        RES = 32
         if millRadius < EPS:
             return
+        res = arcResolution(millRadius, maximum=32)
         self.orient()
-        self.substrates = self.substrates.buffer(millRadius - EPS, resolution=RES) \
-                              .buffer(-millRadius, resolution=RES) \
-                              .buffer(EPS, resolution=RES)
+        self.substrates = self.substrates.buffer(millRadius - EPS, resolution=res) \
+                              .buffer(-millRadius, resolution=res) \
+                              .buffer(EPS, resolution=arcResolution(EPS))
 
 
     def removeIslands(self):
@@ -1006,17 +1413,12 @@ class Substrate:
         """
         if isinstance(self.substrates, Polygon):
             return
-        mainland = []
-        for i, substrate in enumerate(self.substrates.geoms):
-            ismainland = True
-            for j, otherSubstrate in enumerate(self.substrates.geoms):
-                if j == i:
-                    continue
-                if Polygon(otherSubstrate.exterior.coords).contains(substrate):
-                    ismainland = False
-                    break
-            if ismainland:
-                mainland.append(substrate)
+        geoms = np.array(list(self.substrates.geoms), dtype=object)
+        exteriors = shapely.polygons(shapely.get_exterior_ring(geoms))
+        # Pairs (i, j) such that piece i lies within the outline of piece j
+        pieces, outlines = shapely.STRtree(exteriors).query(geoms, predicate="within")
+        islands = set(pieces[pieces != outlines].tolist())
+        mainland = [g for i, g in enumerate(geoms) if i not in islands]
         self.substrates = shapely.geometry.collection.GeometryCollection(mainland)
         self.oriented = False
 
@@ -1026,22 +1428,35 @@ class Substrate:
         """
         return isinstance(self.substrates, Polygon)
 
+    def transformed(self, angle, origin, translation, revertTransformation=None):
+        """
+        Return a copy of the substrate rotated by angle (EDA_ANGLE, following
+        the KiCAD convention) around origin and then translated. The annotations
+        and the partition line are not copied.
+        """
+        # KiCAD has the Y axis pointing down, hence the negative angle
+        geometry = shapely.affinity.rotate(self.substrates, -angle.AsDegrees(),
+                                           origin=(origin[0], origin[1]))
+        geometry = shapely.affinity.translate(geometry, translation[0], translation[1])
+        copy = Substrate([], revertTransformation=revertTransformation)
+        copy.substrates = geometry
+        # Neither rotation nor translation changes orientation of the rings
+        copy.oriented = self.oriented
+        return copy
+
     def translate(self, vec):
         """
-        Translate substrate by vec
+        Translate substrate by vec. The translation of the geometry is deferred
+        until the geometry is read, so consecutive translations are cheap.
         """
-        self.substrates = shapely.affinity.translate(self.substrates, vec[0], vec[1])
-        self.partitionLine = shapely.affinity.translate(self.partitionLine, vec[0], vec[1])
+        dx, dy = self._offset if self._offset is not None else (0, 0)
+        self._offset = (dx + vec[0], dy + vec[1])
+        self._derived = {}
         for annotation in self.annotations:
             o = annotation.origin
             annotation.origin = (o[0] + vec[0], o[1] + vec[1])
-
-        def newRevertTransformation(point, orig=self.revertTransformation, vec=vec):
-            prevPoint = (point[0] - vec[0], point[1] - vec[1])
-            if orig is not None:
-                return orig(prevPoint)
-            return prevPoint
-        self.revertTransformation = newRevertTransformation
+        self.revertOffset = (self.revertOffset[0] + vec[0],
+                             self.revertOffset[1] + vec[1])
 
 def showPolygon(polygon):
     import matplotlib.pyplot as plt
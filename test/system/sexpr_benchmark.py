@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the S-expression parser (kikit.sexpr).
+
+Times parsing and serialization of synthetic boards of the given sizes and of
+the boards in test/resources. For every input and operation it reports the
+throughput (MB/s), the peak RSS of the process and the number of memory blocks
+the result holds. Each measurement runs in a fresh process, so the peak RSS of
+one case doesn't leak into the others.
+
+The results can be saved as a baseline and later runs can be compared against
+it; the script exits with a non-zero code when any case regresses by more than
+the given threshold. Typical workflow:
+
+    ./test/system/sexpr_benchmark.py --save /tmp/sexpr-baseline.json
+    # perform changes to kikit.sexpr
+    ./test/system/sexpr_benchmark.py --baseline /tmp/sexpr-baseline.json
+"""
+
+import argparse
+import gc
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+RESOURCES = REPO_ROOT / "test" / "resources"
+
+# Benchmark the working tree, not an installed KiKit
+sys.path.insert(0, str(REPO_ROOT))
+
+OPERATIONS = ["parseSexprF", "parseSexprListF", "parseSexprFastF",
+              "parseSexprLazyF", "parseSexprMmap", "iterSexprEventsF",
+              "iterSexprChildrenF", "str"]
+
+
+def footprint(rnd, i):
+    x, y = rnd.uniform(0, 300), rnd.uniform(0, 200)
+    pads = "".join(
+        f'\t\t(pad "{p}" smd roundrect (at {rnd.uniform(-5, 5):.4f} {rnd.uniform(-5, 5):.4f}) '
+        f'(size 1.2 1.4) (layers "F.Cu" "F.Paste" "F.Mask") (roundrect_rratio 0.25)\n'
+        f'\t\t\t(net {rnd.randint(1, 500)} "Net-(U{i}-Pad{p})") '
+        f'(uuid "{rnd.getrandbits(128):032x}"))\n'
+        for p in range(1, 5))
+    return (
+        f'\t(footprint "Resistor_SMD:R_0603_1608Metric" (layer "F.Cu")\n'
+        f'\t\t(uuid "{rnd.getrandbits(128):032x}")\n'
+        f'\t\t(at {x:.4f} {y:.4f} {rnd.choice([0, 90, 180, 270])})\n'
+        f'\t\t(property "Reference" "R{i}" (at 0 -1.43 0) (layer "F.SilkS")\n'
+        f'\t\t\t(effects (font (size 1 1) (thickness 0.15))))\n'
+        f'\t\t(fp_line (start -0.8 0.4125) (end 0.8 0.4125)\n'
+        f'\t\t\t(stroke (width 0.1) (type solid)) (layer "F.Fab"))\n'
+        f'{pads}\t)\n')
+
+
+def segment(rnd):
+    x, y = rnd.uniform(0, 300), rnd.uniform(0, 200)
+    return (
+        f'\t(segment (start {x:.4f} {y:.4f}) (end {x + rnd.uniform(-10, 10):.4f} '
+        f'{y + rnd.uniform(-10, 10):.4f}) (width 0.25) '
+        f'(layer "{rnd.choice(["F.Cu", "B.Cu"])}") (net {rnd.randint(1, 500)}) '
+        f'(uuid "{rnd.getrandbits(128):032x}"))\n')
+
+
+def generateBoard(path, size):
+    """
+    Write a synthetic board of roughly the given size (in bytes) resembling a
+    KiCAD 8 board - a mix of footprints and tracks.
+    """
+    rnd = random.Random(size)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        written += f.write('(kicad_pcb (version 20240108) (generator "pcbnew")\n'
+                           '\t(general (thickness 1.6))\n'
+                           '\t(paper "A4")\n')
+        i = 0
+        while written < size:
+            i += 1
+            if i % 3 == 0:
+                written += f.write(footprint(rnd, i))
+            else:
+                written += f.write(segment(rnd))
+        f.write(")\n")
+
+
+def collectInputs(sizes, workdir, includeResources):
+    inputs = []
+    for size in sizes:
+        path = Path(workdir) / f"synthetic-{size}MB.kicad_pcb"
+        if not path.exists():
+            print(f"  generating {path.name}", file=sys.stderr)
+            generateBoard(path, int(size * 1024 * 1024))
+        inputs.append((path.name, str(path)))
+    if includeResources:
+        for path in sorted(RESOURCES.glob("*.kicad_pcb")):
+            inputs.append((path.name, str(path)))
+    return inputs
+
+
+def runCase(path, operation, repeat):
+    """
+    Run a single benchmark case. It is expected to run in a fresh process.
+    """
+    from kikit import sexpr
+
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    size = len(text.encode("utf-8"))
+
+    if operation == "str":
+        tree = sexpr.parseSexprFastS(text)
+        def action():
+            return str(tree)
+    elif operation == "parseSexprMmap":
+        # Maps the file itself, the nodes are built on access
+        def action():
+            return sexpr.parseSexprMmap(path)
+    elif operation.startswith("iter"):
+        # The streaming API keeps nothing alive, just consume it
+        iterate = getattr(sexpr, operation)
+        def action():
+            return sum(1 for _ in iterate(io.StringIO(text)))
+    else:
+        parse = getattr(sexpr, operation)
+        def action():
+            return parse(io.StringIO(text))
+
+    best = None
+    blocks = None
+    for _ in range(repeat):
+        gc.collect()
+        blocksBefore = sys.getallocatedblocks()
+        start = time.perf_counter()
+        result = action()
+        duration = time.perf_counter() - start
+        blocks = sys.getallocatedblocks() - blocksBefore
+        del result
+        best = duration if best is None else min(best, duration)
+
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peakRss *= 1024
+    return {
+        "size": size,
+        "seconds": best,
+        "throughput": size / best / 1e6,
+        "peakRss": peakRss,
+        "blocks": blocks,
+    }
+
+
+def runIsolated(path, operation, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(runCase, (path, operation, repeat))
+
+
+def compare(results, baseline, threshold):
+    """
+    Return list of regression messages
+    """
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if result["throughput"] < old["throughput"] * (1 - threshold):
+            regressions.append(f"{key}: throughput {old['throughput']:.2f} -> "
+                               f"{result['throughput']:.2f} MB/s")
+        if result["peakRss"] > old["peakRss"] * (1 + threshold):
+            regressions.append(f"{key}: peak RSS {old['peakRss'] / 1e6:.1f} -> "
+                               f"{result['peakRss'] / 1e6:.1f} MB")
+    return regressions
+
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--sizes", type=float, nargs="*", default=[1, 10, 100],
+        help="Sizes of the synthetic boards in MB (default: 1 10 100)")
+    p.add_argument("--operations", nargs="*", default=OPERATIONS,
+        choices=OPERATIONS, help="Operations to benchmark (default: all)")
+    p.add_argument("--no-resources", action="store_true",
+        help="Skip the boards from test/resources")
+    p.add_argument("--repeat", type=int, default=3,
+        help="Number of repetitions, the best time is reported (default: 3)")
+    p.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(),
+        "kikit-sexpr-benchmark"),
+        help="Directory for the generated synthetic boards")
+    p.add_argument("--save", help="Save the results as a JSON baseline")
+    p.add_argument("--baseline", help="Compare the results with a JSON baseline")
+    p.add_argument("--threshold", type=float, default=0.2,
+        help="Relative slowdown (or RSS increase) considered to be a regression "
+             "(default: 0.2)")
+    return p
+
+
+def main():
+    args = build_parser().parse_args()
+    os.makedirs(args.workdir, exist_ok=True)
+
+    inputs = collectInputs(args.sizes, args.workdir, not args.no_resources)
+    results = {}
+    print(f"{'input':<40} {'operation':<20} {'MB/s':>8} {'peak RSS':>10} {'blocks':>10}")
+    for name, path in inputs:
+        for operation in args.operations:
+            r = runIsolated(path, operation, args.repeat)
+            results[f"{name}/{operation}"] = r
+            print(f"{name:<40} {operation:<20} {r['throughput']:>8.2f} "
+                  f"{r['peakRss'] / 1e6:>8.1f}MB {r['blocks']:>10}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        print("\n=== Comparison with baseline ===")
+        for r in regressions:
+            print(f"  [FAIL] {r}")
+        if regressions:
+            sys.exit(1)
+        print("  [PASS] no regression")
+
+
+if __name__ == "__main__":
+    main()
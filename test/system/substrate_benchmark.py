@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the predicate-heavy operations of kikit.substrate.
+
+Builds synthetic panels - a grid of boards where every other board has a
+cutout with a piece of substrate (an island) in it - of the given sizes and
+times the operations on them.
+Each operation is compared with a straightforward reference implementation;
+the script checks that both give the same result and reports the speedup.
+
+    ./test/system/substrate_benchmark.py --sizes 100 400
+"""
+
+import argparse
+import sys
+import time
+from itertools import product
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# Benchmark the working tree, not an installed KiKit
+sys.path.insert(0, str(REPO_ROOT))
+
+from shapely.geometry import Polygon, MultiPolygon, box
+from shapely.geometry.collection import GeometryCollection
+
+from kikit.substrate import Substrate, buildContainmentGraph
+from kikit.units import mm
+
+
+def generatePanel(count):
+    """
+    Return a substrate with count boards in a grid. Every other board has a
+    cutout with a small island in it.
+    """
+    cols = max(1, int(count ** 0.5))
+    pitch = 30 * mm
+    pieces = []
+    for i in range(count):
+        x = (i % cols) * pitch
+        y = (i // cols) * pitch
+        board = box(x, y, x + 25 * mm, y + 25 * mm)
+        if i % 2 == 0:
+            board = board.difference(box(x + 5 * mm, y + 5 * mm, x + 20 * mm, y + 20 * mm))
+            pieces.append(box(x + 10 * mm, y + 10 * mm, x + 15 * mm, y + 15 * mm))
+        pieces.append(board)
+    substrate = Substrate([])
+    substrate.substrates = MultiPolygon(pieces)
+    return substrate
+
+
+def referenceRemoveIslands(substrate):
+    geoms = list(substrate.substrates.geoms)
+    mainland = []
+    for i, piece in enumerate(geoms):
+        if not any(Polygon(other.exterior.coords).contains(piece)
+                   for j, other in enumerate(geoms) if j != i):
+            mainland.append(piece)
+    return GeometryCollection(mainland)
+
+
+def removeIslands(substrate):
+    substrate.removeIslands()
+    return substrate.substrates
+
+
+def outlinePolygons(substrate):
+    """
+    Return polygons of all the rings of the substrate - the input of
+    buildContainmentGraph when reconstructing a board from its Edge.Cuts
+    """
+    return [Polygon(ring) for geom in substrate.substrates.geoms
+            for ring in [geom.exterior, *geom.interiors]]
+
+
+def referenceContainmentGraph(substrate):
+    polygons = outlinePolygons(substrate)
+    relation = {key: [] for key in range(len(polygons))}
+    for a, b in product(range(len(polygons)), range(len(polygons))):
+        if a != b and polygons[a].contains(polygons[b]):
+            relation[a].append(b)
+    return relation
+
+
+def containmentGraph(substrate):
+    return buildContainmentGraph(outlinePolygons(substrate))
+
+
+OPERATIONS = {
+    "removeIslands": (removeIslands, referenceRemoveIslands),
+    "buildContainmentGraph": (containmentGraph, referenceContainmentGraph),
+}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 400],
+        help="Number of boards in the panel (default: 100 400)")
+    parser.add_argument("--operations", nargs="*", default=list(OPERATIONS),
+        choices=list(OPERATIONS), help="Operations to benchmark (default: all)")
+    parser.add_argument("--no-reference", action="store_true",
+        help="Skip the (slow) reference implementations")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'operation':<24} {'boards':>7} {'pieces':>7} {'time [s]':>10} {'reference [s]':>14}")
+    for size in args.sizes:
+        for name in args.operations:
+            operation, reference = OPERATIONS[name]
+            pieces = len(generatePanel(size).substrates.geoms)
+            result, duration = timed(operation, generatePanel(size))
+            line = f"{name:<24} {size:>7} {pieces:>7} {duration:>10.3f}"
+            if not args.no_reference:
+                expected, refDuration = timed(reference, generatePanel(size))
+                line += f" {refDuration:>14.3f}"
+                same = result.equals(expected) if hasattr(result, "equals") \
+                    else result == expected
+                if not same:
+                    line += "  [FAIL] results differ"
+                    failed = True
+            print(line)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 import pytest
-from pcbnew import EDA_ANGLE, DEGREES_T
+import random
+import pcbnew
+from pcbnew import EDA_ANGLE, DEGREES_T, VECTOR2I
 from kikit.common import KiAngle
+from kikit.defs import STROKE_T
 from kikit.panelize import (
     GridPlacerBase, BasicGridPosition, OddEvenRowsPosition,
-    OddEvenColumnPosition, OddEvenRowsColumnsPosition, prolongCut
+    OddEvenColumnPosition, OddEvenRowsColumnsPosition, prolongCut,
+    doTransformation, undoTransformation, doTransformations,
+    undoTransformations
 )
 from shapely.geometry import LineString
 from math import sqrt
@@ -70,3 +75,47 @@ def test_prolongCut():
 
     assert prolonged.coords[0] == pytest.approx((sqrt(2)/2 * -0.5, sqrt(2)/2 * -0.5))
     assert prolonged.coords[1] == pytest.approx((1 + sqrt(2)/2 * 0.5, 1 + sqrt(2)/2 * 0.5))
+
+
+def pcbnewDoTransformation(point, rotation, origin, translation):
+    segment = pcbnew.PCB_SHAPE()
+    segment.SetShape(STROKE_T.S_SEGMENT)
+    segment.SetStart(VECTOR2I(int(point[0]), int(point[1])))
+    segment.SetEnd(VECTOR2I(0, 0))
+    segment.Rotate(origin, -1 * rotation)
+    segment.Move(translation)
+    return (segment.GetStartX(), segment.GetStartY())
+
+
+def pcbnewUndoTransformation(point, rotation, origin, translation):
+    segment = pcbnew.PCB_SHAPE()
+    segment.SetShape(STROKE_T.S_SEGMENT)
+    segment.SetStart(VECTOR2I(int(point[0]), int(point[1])))
+    segment.SetEnd(VECTOR2I(0, 0))
+    segment.Move(VECTOR2I(-translation[0], -translation[1]))
+    segment.Rotate(origin, -1 * rotation)
+    return (segment.GetStartX(), segment.GetStartY())
+
+
+def asTuple(point):
+    return (point.x, point.y)
+
+
+def test_transformationMatchesPcbnew():
+    rnd = random.Random(42)
+    angles = [0, 45, 90, 135, 180, 270, -90, 30, 33.3, -120.5, 400]
+    points = [(rnd.randint(-300000000, 300000000), rnd.randint(-300000000, 300000000))
+              for _ in range(200)]
+    points += [(0, 0), (1, -1), (1500001, 2500001)]
+    for angle in angles:
+        rotation = EDA_ANGLE(angle, DEGREES_T)
+        origin = VECTOR2I(rnd.randint(-100000000, 100000000), rnd.randint(-100000000, 100000000))
+        translation = VECTOR2I(rnd.randint(-100000000, 100000000), rnd.randint(-100000000, 100000000))
+
+        expected = [pcbnewDoTransformation(p, rotation, origin, translation) for p in points]
+        assert [asTuple(doTransformation(p, rotation, origin, translation)) for p in points] == expected
+        assert doTransformations(points, rotation, origin, translation).tolist() == [list(p) for p in expected]
+
+        expected = [pcbnewUndoTransformation(p, rotation, origin, translation) for p in points]
+        assert [asTuple(undoTransformation(p, rotation, origin, translation)) for p in points] == expected
+        assert undoTransformations(points, rotation, origin, translation).tolist() == [list(p) for p in expected]
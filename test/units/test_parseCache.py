@@ -0,0 +1,92 @@
+import os
+import shutil
+import pytest
+from kikit.parseCache import ParseCache
+
+def test_cache_hit(tmp_path):
+    source = tmp_path / "source.txt"
+    source.write_text("(a b)")
+    cache = ParseCache(str(tmp_path / "cache"), 1024 * 1024)
+
+    calls = []
+    def compute(content):
+        calls.append(1)
+        return ["parsed", content.decode("utf-8")]
+
+    assert cache.fetch("test", str(source), compute) == ["parsed", "(a b)"]
+    assert cache.fetch("test", str(source), compute) == ["parsed", "(a b)"]
+    assert len(calls) == 1
+
+    # Different parameters or content give a different entry
+    cache.fetch("test", str(source), compute, params=(1,))
+    assert len(calls) == 2
+    source.write_text("(a c)")
+    assert cache.fetch("test", str(source), compute) == ["parsed", "(a c)"]
+    assert len(calls) == 3
+
+def test_cache_eviction(tmp_path):
+    cache = ParseCache(str(tmp_path), 2500)
+    for i in range(2):
+        cache.put(str(i), "x" * 1000)
+        # Make the access order explicit, the timestamps might be too coarse
+        os.utime(cache._entryPath(str(i)), (i, i))
+    cache.get("0") # Touch the older entry
+    cache.put("2", "x" * 1000)
+    assert cache.size() <= 2500
+    assert cache.get("0") == "x" * 1000
+    assert cache.get("2") == "x" * 1000
+    with pytest.raises(KeyError):
+        cache.get("1")
+
+def test_shared_subsheet(tmp_path, monkeypatch):
+    from kikit import eeschema_v6
+    source = os.path.join(os.path.dirname(__file__), "..", "resources",
+                          "assembly_project_1_KiCAD7")
+    project = tmp_path / "project"
+    shutil.copytree(source, project)
+    # A second root schematic sharing the sub-sheets, but with a different uuid
+    rootA = project / "assembly_project_1_KiCAD7.kicad_sch"
+    rootB = project / "variant.kicad_sch"
+    rootB.write_text(rootA.read_text(encoding="utf-8").replace(
+        "676365b0-5210-41e5-b353-6ca9818a4635",
+        "00000000-0000-0000-0000-000000000000", 1), encoding="utf-8")
+
+    expectedA = eeschema_v6.collectSymbols(str(rootA))
+    expectedB = eeschema_v6.collectSymbols(str(rootB))
+
+    monkeypatch.setenv("KIKIT_PARSE_CACHE", str(tmp_path / "cache"))
+    # Sheets are parsed from the cached content, so we recognize them by uuid
+    def sheetUuid(items):
+        return next(x for x in items if eeschema_v6.isUuid(x)).items[1].value
+    sheetNames = {
+        sheetUuid(eeschema_v6.iterSheetItems(str(project / name))): name
+        for name in ["nested.kicad_sch", "bottom_sheet.kicad_sch"]}
+    parsed = []
+    iterSheetItemsF = eeschema_v6.iterSheetItemsF
+    def countingIterSheetItemsF(sheetFile):
+        items = list(iterSheetItemsF(sheetFile))
+        parsed.append(sheetNames.get(sheetUuid(items)))
+        return items
+    monkeypatch.setattr(eeschema_v6, "iterSheetItemsF", countingIterSheetItemsF)
+
+    assert eeschema_v6.collectSymbols(str(rootA)) == expectedA
+    assert eeschema_v6.collectSymbols(str(rootB)) == expectedB
+    assert parsed.count("nested.kicad_sch") == 1
+    assert parsed.count("bottom_sheet.kicad_sch") == 1
+    # The symbols of the shared sheets get the path of their root
+    symbolsB, _ = expectedB
+    assert all(s.path.startswith("/00000000-") for s in symbolsB)
+    # Repeated runs skip parsing entirely
+    parsed.clear()
+    assert eeschema_v6.collectSymbols(str(rootB)) == expectedB
+    assert parsed == []
+
+def test_default_cache(tmp_path, monkeypatch):
+    from kikit.parseCache import defaultParseCache
+    monkeypatch.delenv("KIKIT_PARSE_CACHE", raising=False)
+    assert defaultParseCache() is None
+    monkeypatch.setenv("KIKIT_PARSE_CACHE", str(tmp_path / "a"))
+    cache = defaultParseCache()
+    assert cache is defaultParseCache()
+    monkeypatch.setenv("KIKIT_PARSE_CACHE", str(tmp_path / "b"))
+    assert defaultParseCache().directory == str(tmp_path / "b")
@@ -1,4 +1,5 @@
 import pytest
+import sys
 from kikit.sexpr import *
 
 def eval(s, truth):
@@ -111,3 +112,156 @@ def test_comment_between_top_level_sexprs():
     rules = parseSexprListF(StringIO(source))
     assert len(rules) == 2
     assert ''.join(str(r) for r in rules) == source
+
+def test_fast_backend_matches_stream():
+    SOURCE = "../resources/conn.kicad_pcb"
+    with open(SOURCE, encoding="utf-8") as f:
+        truth = f.read()
+
+    for limit in [None, 0, 3]:
+        streamAst = parseSexprS(truth, limit=limit)
+        fastAst = parseSexprFastS(truth, limit=limit)
+        assert fastAst == streamAst
+        assert str(fastAst) == truth
+
+    source = '(a "b \\" c" d"e (f)\n  #(comment))\n  "")  \n'
+    assert parseSexprFastS(source) == parseSexprS(source)
+    assert str(parseSexprFastS(source)) == source
+
+def test_fast_backend_list():
+    source = '''# header
+(version 1)
+(rule "Active"
+  #(constraint clearance(min 0.2mm))
+  (constraint clearance(min 0.3mm))
+)
+'''
+    rules = parseSexprListFastS(source)
+    assert rules == parseSexprListF(StringIO(source))
+    assert ''.join(str(r) for r in rules) == source
+
+def test_fast_backend_errors():
+    with pytest.raises(ParseError):
+        parseSexprFastS("(a (b)")
+    with pytest.raises(ParseError):
+        parseSexprFastS('(a "b)')
+    with pytest.raises(ParseError):
+        parseSexprFastS("a b")
+
+def test_mmap_backend():
+    SOURCE = "../resources/conn.kicad_pcb"
+    with open(SOURCE, encoding="utf-8") as f:
+        truth = f.read()
+
+    ast = parseSexprMmap(SOURCE)
+    # Untouched tree is copied from the mapped file
+    assert not ast.isParsed()
+    assert str(ast) == truth
+
+    assert ast == parseSexprS(truth)
+    assert str(ast) == truth
+
+    # Modified nodes serialize with the new value
+    version = findNode(ast, "version")
+    version.items[1].value = "42"
+    assert str(version).strip() == "(version 42)"
+
+def test_mmap_backend_errors(tmp_path):
+    for source in ["(a (b)", '(a "b)', "a b"]:
+        path = tmp_path / "broken.kicad_pcb"
+        path.write_text(source)
+        with pytest.raises(ParseError):
+            parseSexprMmap(path)
+
+def test_lazy_parsing():
+    SOURCE = "../resources/conn.kicad_pcb"
+    with open(SOURCE, encoding="utf-8") as f:
+        truth = f.read()
+
+    ast = parseSexprLazyS(truth)
+    paper = findNode(ast, "paper")
+    assert paper[1] == "A4"
+    # Only the nodes up to the paper were parsed
+    assert not ast.isParsed()
+    assert all(not x.isParsed() for x in ast.items[10:] if isinstance(x, LazySExpr))
+    assert str(ast) == truth
+
+    ast = parseSexprLazyS(truth)
+    assert ast == parseSexprS(truth)
+    assert str(ast) == truth
+
+def test_lazy_modification():
+    source = '(a (b "x)(" (c d)) # comment (\n (paper "A4") (e))'
+    ast = parseSexprLazyS(source)
+    paper = findNode(ast, "paper")
+    paper.items[1].value = "A3"
+    assert str(ast) == source.replace("A4", "A3")
+    assert findNode(ast, "b")[1] == "x)("
+
+def test_event_api():
+    source = '(a "b" (c d)\n  #comment\n  (e))'
+    events = list(iterSexprEventsF(StringIO(source)))
+    assert [e for e, _ in events] == [
+        SexprEvent.ENTER, SexprEvent.ATOM, SexprEvent.ATOM,
+        SexprEvent.ENTER, SexprEvent.ATOM, SexprEvent.ATOM, SexprEvent.EXIT,
+        SexprEvent.ENTER, SexprEvent.ATOM, SexprEvent.EXIT,
+        SexprEvent.EXIT]
+    assert events[7][1] == "\n  #comment\n  "
+
+def test_iterate_children():
+    SOURCE = "../resources/conn.kicad_pcb"
+    with open(SOURCE, encoding="utf-8") as f:
+        truth = parseSexprF(f)
+    with open(SOURCE, encoding="utf-8") as f:
+        children = list(iterSexprChildrenF(f))
+    assert children == truth.items
+
+def test_streaming_chunk_boundaries():
+    SOURCE = "../resources/conn.kicad_pcb"
+    with open(SOURCE, encoding="utf-8") as f:
+        source = f.read()
+    truth = parseSexprS(source)
+    events = [(e, str(p)) for e, p in iterSexprEventsF(StringIO(source))]
+    for size in [1, 2, 7]:
+        assert [(e, str(p)) for e, p in iterSexprEventsF(StringIO(source), size)] == events
+        assert list(iterSexprChildrenF(StringIO(source), size)) == truth.items
+    for truncated in ['(a "b', "(a (b)", "(a b"]:
+        with pytest.raises(ParseError):
+            list(iterSexprEventsF(StringIO(truncated), 2))
+        with pytest.raises(ParseError):
+            list(iterSexprChildrenF(StringIO(truncated), 2))
+
+def test_dump_patched_tree():
+    SOURCE = "../resources/conn.kicad_pcb"
+    with open(SOURCE, encoding="utf-8") as f:
+        truth = f.read()
+
+    ast = parseSexprLazyS(truth)
+    paper = findNode(ast, "paper")
+    paper.items = [Atom("paper"), Atom("User", " ", quoted=True),
+                   Atom("100", " "), Atom("80", " ")]
+    output = StringIO()
+    dumpSexprF(ast, output)
+    assert output.getvalue() == truth.replace('(paper "A4")', '(paper "User" 100 80)')
+
+    output = StringIO()
+    dumpSexprF(parseSexprS(truth), output)
+    assert output.getvalue() == truth
+
+def test_deep_nesting():
+    depth = 10 * sys.getrecursionlimit()
+    source = "(a " * depth + "b" + ")" * depth
+    for parser in [parseSexprS, parseSexprFastS]:
+        ast = parser(source)
+        assert str(ast) == source
+
+def test_shared_strings():
+    source = '(a\n  (at 1 2)\n  (at 1 "2"))'
+    for parse in [parseSexprFastS, parseSexprLazyS]:
+        expr = parse(source)
+        first, second = expr[1], expr[2]
+        assert first.leadingWhitespace is second.leadingWhitespace
+        assert first[0].value is second[0].value
+        assert first[1].value is second[1].value
+        assert str(expr) == source
+        assert expr == parseSexprS(source)
@@ -1,5 +1,6 @@
 import pytest
-from shapely.geometry import Point
+import numpy as np
+from shapely.geometry import Point, LineString, box
 from kikit.substrate import *
 
 def test_biteBoundary():
@@ -21,3 +22,192 @@ def test_biteBoundary():
 
     t5 = biteBoundary(l1, Point(1, 0.25), Point(1, 0.75), 0.1)
     assert t5 == LineString([(1, 0.25), (1, 0.75)])
+
+def test_findRings():
+    starts = np.array([(0, 0), (100, 0), (5, 5), (100, 100), (500, 500)])
+    ends = np.array([(100, 0), (100, 100), (5, 5), (0, 0), (500, 500)])
+    assert findRings(starts, ends) == [[0, 1, 3], [2], [4]]
+
+    # Reversed edges are followed as well
+    starts = np.array([(0, 0), (100, 100), (100, 100)])
+    ends = np.array([(100, 0), (100, 0), (0, 0)])
+    assert findRings(starts, ends) == [[0, 1, 2]]
+
+    with pytest.raises(PositionError):
+        findRings(np.array([(0, 0), (100, 0)]), np.array([(100, 0), (200, 0)]))
+
+def test_roundPoints():
+    points = [(149, 150), (250, -150), (-51, 12345)]
+    assert roundPoints(points).tolist() == [list(roundPoint(p)) for p in points]
+
+def test_approximateArcs():
+    centers = np.array([(0, 0), (100, 100)])
+    radii = np.array([10, 20])
+    arcs = approximateArcs(centers, radii, np.array([0.0, 45.0]),
+                           np.array([90.0, 45.0]), np.array([False, True]))
+    assert len(arcs[0]) == 32
+    assert np.allclose(arcs[0][0], (10, 0)) and np.allclose(arcs[0][-1], (0, 10))
+    assert len(arcs[1]) == SEGMENTS_PER_FULL
+    assert np.allclose(np.linalg.norm(arcs[1] - (100, 100), axis=1), 20)
+
+def test_approximateArcsMatchesPcbnew():
+    # Reference is the per-arc approximation using the angle conversion of KiCAD
+    from pcbnew import EDA_ANGLE, DEGREES_T
+    rnd = np.random.default_rng(42)
+    count = 50
+    centers = rnd.integers(-10**8, 10**8, size=(count, 2))
+    radii = rnd.integers(1, 10**7, size=count)
+    startAngles = rnd.uniform(-360, 360, size=count)
+    endAngles = startAngles + rnd.uniform(-360, 360, size=count)
+    circles = rnd.random(count) < 0.2
+    arcs = approximateArcs(centers, radii, startAngles, endAngles, circles)
+    for i, arc in enumerate(arcs):
+        start = EDA_ANGLE(float(startAngles[i]), DEGREES_T)
+        end = start + EDA_ANGLE(360, DEGREES_T) if circles[i] \
+              else EDA_ANGLE(float(endAngles[i]), DEGREES_T)
+        if circles[i]:
+            segments = SEGMENTS_PER_FULL
+        else:
+            segments = abs(int((end.AsDegrees() - start.AsDegrees()) * SEGMENTS_PER_FULL // 360))
+        theta = np.linspace(start.AsRadians(), end.AsRadians(), max(segments, 12))
+        x = centers[i][0] + radii[i] * np.cos(theta)
+        y = centers[i][1] + radii[i] * np.sin(theta)
+        assert np.array_equal(arc, np.column_stack([x, y]))
+
+def test_approximateBeziers():
+    starts = np.array([(0, 0), (0, 0)])
+    ends = np.array([(100, 0), (100, 0)])
+    curves = approximateBeziers(starts, np.array([(0, 50), (0, 0)]),
+                                np.array([(100, 50), (100, 0)]), ends)
+    assert len(curves[0]) == CURVE_POINTS + 2
+    assert np.array_equal(curves[0][0], (0, 0)) and np.array_equal(curves[0][-1], (100, 0))
+    # Degenerated curve is a straight line
+    assert curves[1].tolist() == [[0, 0], [0, 0], [100, 0], [100, 0]]
+
+def test_deferredUnion():
+    pieces = [box(i * 10, 0, i * 10 + 15, 10) for i in range(10)]
+    immediate = Substrate([])
+    deferred = Substrate([], deferUnion=True)
+    for piece in pieces:
+        immediate.union(piece)
+        deferred.union(piece)
+    assert len(deferred._pendingUnion) == len(pieces)
+    assert deferred.substrates.equals(immediate.substrates)
+    assert deferred._pendingUnion == []
+    assert deferred.isSinglePiece()
+
+def test_ringIndex():
+    frame = box(0, 0, 100, 100).difference(box(10, 10, 40, 90)) \
+        .difference(box(60, 10, 90, 90))
+    index = RingIndex(MultiPolygon([frame, box(20, 20, 30, 80)]))
+    ray = LineString([(50, 50), (-10, 50)])
+    candidates = index.candidates(ray)
+    assert [len(rings) for _, rings in candidates] == [2, 1]
+    assert candidates[0][1][0].equals(index.geoms[0].exterior)
+    assert index.candidates(LineString([(50, 50), (55, 50)])) == []
+
+def test_tabs():
+    from kikit.annotations import TabAnnotation
+    substrate = Substrate([])
+    substrate.union([box(0, 0, fromMm(10), fromMm(10)),
+                     box(fromMm(20), 0, fromMm(30), fromMm(10))])
+    annotations = [
+        TabAnnotation(None, (fromMm(15), fromMm(5)), (-1, 0), fromMm(2)),
+        TabAnnotation(None, (fromMm(15), fromMm(5)), (1, 0), fromMm(2)),
+        TabAnnotation(None, (fromMm(15), fromMm(5)), (0, 1), fromMm(2)),
+        TabAnnotation(None, (fromMm(5), fromMm(5)), (1, 0), fromMm(2))
+    ]
+    results = substrate.tabs(annotations)
+    for annotation, result in zip(annotations[:2], results):
+        tab, cut = substrate.tab(annotation.origin, annotation.direction,
+                                 annotation.width)
+        assert result[0].equals(tab) and result[1].equals(cut)
+    assert isinstance(results[2], TabError)
+    assert isinstance(results[3], TabError)
+
+def test_tabsWithoutHits():
+    from kikit.annotations import TabAnnotation
+    substrate = Substrate([])
+    substrate.union(box(0, 0, fromMm(10), fromMm(10)))
+    missing = TabAnnotation(None, (fromMm(15), fromMm(5)), (1, 0), fromMm(2))
+    valid = TabAnnotation(None, (fromMm(15), fromMm(5)), (-1, 0), fromMm(2))
+    results = substrate.tabs([missing])
+    assert len(results) == 1 and isinstance(results[0], TabError)
+    results = substrate.tabs([missing, valid])
+    assert isinstance(results[0], TabError)
+    tab, cut = substrate.tab(valid.origin, valid.direction, valid.width)
+    assert results[1][0].equals(tab) and results[1][1].equals(cut)
+
+def test_preparedInvalidation():
+    substrate = Substrate([], deferUnion=True)
+    substrate.union(box(0, 0, 10, 10))
+    assert substrate.prepared().contains(Point(5, 5))
+    assert substrate.prepared() is substrate.prepared()
+    substrate.union(box(20, 0, 30, 10))
+    assert substrate.prepared().contains(Point(25, 5))
+    substrate.cut(box(0, 0, 10, 10))
+    assert not substrate.prepared().contains(Point(5, 5))
+    assert substrate.prepared(1).intersects(Point(19.5, 5))
+    substrate.translate((100, 0))
+    assert substrate.preparedExterior().contains(Point(125, 5))
+    assert substrate.preparedBoundary().intersects(Point(120, 5))
+
+def test_circleFitCandidates():
+    center, radius = np.array([fromMm(100), fromMm(-50)]), fromMm(5)
+    angles = np.linspace(0, np.pi / 2, 33)
+    arc = center + radius * np.column_stack((np.cos(angles), np.sin(angles)))
+    candidates = CircleFitCandidates(tolerance=fromMm(0.01))
+    assert all(candidates.addPoint(p) for p in np.round(arc))
+    c, r = candidates.foundCircle
+    assert np.linalg.norm(c - center) < fromMm(0.001)
+    assert abs(r - radius) < fromMm(0.001)
+    # A point off the circle is rejected and the fit is kept
+    assert not candidates.addPoint(center + (radius, radius))
+    assert len(candidates) == len(arc)
+    assert np.allclose(candidates.foundCircle[0], c)
+
+def test_serializeRecords():
+    substrate = Substrate([])
+    substrate.union(box(0, 0, fromMm(20), fromMm(10)))
+    records = substrate.serializeRecords()
+    assert len(records) == 4
+    assert all(r[0] == STROKE_T.S_SEGMENT for r in records)
+    # The segments form a closed chain
+    assert all(a[3:5] == b[1:3] for a, b in zip(records, records[1:] + records[:1]))
+
+    substrate = Substrate([])
+    substrate.union(Point(fromMm(20), fromMm(10)).buffer(fromMm(5), 32))
+    assert [r[0] for r in substrate.serializeRecords(reconstructArcs=True)] == [STROKE_T.S_CIRCLE]
+
+def test_arcResolution():
+    tolerance = fromMm(0.001)
+    for radius in [fromMm(0.5), fromMm(1), fromMm(3)]:
+        resolution = arcResolution(radius, tolerance)
+        assert radius * (1 - np.cos(np.pi / 4 / resolution)) <= tolerance
+    assert arcResolution(fromMm(0.001)) == 8
+    assert arcResolution(fromMm(1000)) == 64
+
+def test_localTabFillet():
+    # A distant, complex piece of substrate doesn't affect the fillet
+    board = box(0, 0, fromMm(20), fromMm(20))
+    distant = Point(fromMm(100), fromMm(100)).buffer(fromMm(10), 256)
+    substrate = Substrate([])
+    substrate.union([board, distant])
+    origin, direction = (fromMm(10), fromMm(25)), (0, -1)
+    tab, face = substrate.tab(origin, direction, fromMm(3), fillet=fromMm(1))
+    plain, _ = substrate.tab(origin, direction, fromMm(3))
+    assert tab.area > plain.area
+    assert face.length > fromMm(3)
+    assert tab.distance(distant) > fromMm(50)
+
+def test_lazyTranslate():
+    substrate = Substrate([], deferUnion=True,
+                          revertTransformation=lambda p: (p[0] * 2, p[1] * 2))
+    substrate.union(box(0, 0, 10, 10))
+    substrate.partitionLine = LineString([(0, 20), (10, 20)])
+    substrate.translate((100, 0))
+    substrate.union(box(110, 0, 120, 10))
+    substrate.translate((0, 50))
+    assert substrate.substrates.bounds == (100, 50, 120, 60)
+    assert substrate.partitionLine.bounds == (100, 70, 110, 70)
+    assert substrate.backToSource((100, 50)) == (0, 0)